@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Per-room frame-time benchmark.
+
+Each room from create_rooms() gets a seeded, fixed-point World with the
+knight dropped in and a scripted player: pace between the walls, jump every
+so often, swing the sword. The knight can't die and is put back if a door
+takes them out, so every frame measured is a frame of that room, and
+anything killed comes straight back with the health it started with. Each
+frame is timed as update (World.step) and draw (World.draw plus the flip);
+a second, shorter pass under tracemalloc measures allocations.
+
+The output is JSON, for diffing runs or feeding a regression check:
+
+    python bench/bench_rooms.py --out before.json
+    python bench/bench_rooms.py --rooms dragon knights --frames 2000
+
+Timings are in milliseconds. Allocation numbers per frame are:
+    blocks    - net new memory blocks (sys.getallocatedblocks), ~0 when nothing leaks
+    peak_kb   - most memory a frame had live on top of where it started (tracemalloc)
+    gc_gen0   - gen 0 collections, which go up with how many objects get made
+
+--draw-calls adds a third pass with drawstats.DrawStats installed: draw calls
+and kilopixels per frame for each thing drawn, to see what to bake first.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pygame  # noqa: E402
+import game  # noqa: E402
+from replay import IN_LEFT, IN_RIGHT, IN_UP, IN_X, IN_D  # noqa: E402
+from drawstats import DrawStats  # noqa: E402
+
+# Boss rooms and the rooms with the most enemies, for --worst
+WORST_CASES = ('dragon', 'skeleton_boss', 'knights', 'cliffs', 'crystal_plains')
+
+
+class Script:
+    """Pace between x=100 and x=650, jump every 45 frames, swing every 12, dash now and then"""
+    def __init__(self):
+        self.heading = IN_RIGHT
+    
+    def __call__(self, world, frame):
+        x = world.player.x
+        if x > 650:
+            self.heading = IN_LEFT
+        elif x < 100:
+            self.heading = IN_RIGHT
+        bits = self.heading
+        if frame % 45 == 0:
+            bits |= IN_UP
+        if frame % 12 == 0:
+            bits |= IN_X
+        if frame % 150 == 75:
+            bits |= IN_D
+        return bits
+
+
+def make_world(name, seed):
+    world = game.World(seed, fixed_point=True)
+    world.current_room = name
+    world.player.has_double_jump = world.player.has_dash = True
+    return world
+
+
+def starting_health(world, name):
+    """Each roster entity's health (None for things without any), for stay()"""
+    return [getattr(entity, 'health', None) for entity in world.rooms[name].roster]
+
+
+def stay(world, name, health):
+    """Heal the knight, put them back if a door took them somewhere else,
+    and bring back anything they killed, so the room stays as busy as it started.
+    health is the room's starting_health()"""
+    world.player.health = world.player.max_health
+    room = world.rooms[name]
+    if not all(room.present):
+        for entity, here, full in zip(room.roster, room.present, health):
+            if not here and full is not None:
+                entity.health = full
+        room.set_present(b'\x01' * len(room.roster))
+    if world.current_room != name:
+        world.current_room = name
+        world.player.x, world.player.y, world.player.vel_y = 400, 300, 0
+        return 1
+    return 0
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    pick = lambda fraction: ordered[round(fraction * last)] * 1000  # noqa: E731
+    return {
+        'mean': statistics.fmean(ordered) * 1000,
+        'p50': pick(0.5),
+        'p90': pick(0.9),
+        'p99': pick(0.99),
+        'max': ordered[-1] * 1000,
+    }
+
+
+def time_room(name, frames, warmup, seed, screen):
+    world = make_world(name, seed)
+    health = starting_health(world, name)
+    script = Script()
+    update, draw, total = [], [], []
+    left = 0
+    clock = time.perf_counter
+    for frame in range(warmup + frames):
+        bits = script(world, frame)
+        start = clock()
+        world.step(bits)
+        stepped = clock()
+        world.draw(screen)
+        pygame.display.flip()
+        done = clock()
+        left += stay(world, name, health)
+        if frame >= warmup:
+            update.append(stepped - start)
+            draw.append(done - stepped)
+            total.append(done - start)
+    return {
+        'update_ms': percentiles(update),
+        'draw_ms': percentiles(draw),
+        'frame_ms': percentiles(total),
+        'entities': len(world.rooms[name].entities),
+        'door_resets': left,
+    }
+
+
+def allocations(name, frames, warmup, seed, screen):
+    world = make_world(name, seed)
+    health = starting_health(world, name)
+    script = Script()
+    for frame in range(warmup):
+        world.step(script(world, frame))
+        world.draw(screen)
+        stay(world, name, health)
+    gc.collect()
+    collections = gc.get_stats()[0]['collections']
+    blocks = sys.getallocatedblocks()
+    peaks = []
+    tracemalloc.start()
+    for frame in range(warmup, warmup + frames):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        world.step(script(world, frame))
+        world.draw(screen)
+        stay(world, name, health)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return {
+        'blocks': (sys.getallocatedblocks() - blocks) / frames,
+        'peak_kb': statistics.fmean(peaks) / 1024,
+        'peak_kb_max': max(peaks) / 1024,
+        'gc_gen0': (gc.get_stats()[0]['collections'] - collections) / frames,
+    }
+
+
+def draw_calls(name, frames, warmup, seed, screen):
+    world = make_world(name, seed)
+    health = starting_health(world, name)
+    script = Script()
+    for frame in range(warmup):
+        world.step(script(world, frame))
+        stay(world, name, health)
+    stats = DrawStats()
+    stats.install()
+    try:
+        for frame in range(warmup, warmup + frames):
+            world.step(script(world, frame))
+            world.draw(stats.screen(screen))
+            stats.end_frame()
+            stay(world, name, health)
+    finally:
+        stats.uninstall()
+    return stats.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every room with a scripted player")
+    parser.add_argument('--rooms', nargs='+', help="rooms to run (default: every room)")
+    parser.add_argument('--worst', action='store_true', help="just the boss and enemy-heavy rooms")
+    parser.add_argument('--frames', type=int, default=1200, help="frames timed per room")
+    parser.add_argument('--warmup', type=int, default=120, help="frames run first and not timed")
+    parser.add_argument('--alloc-frames', type=int, default=300,
+                        help="frames for the allocation pass (0 skips it)")
+    parser.add_argument('--draw-calls', action='store_true',
+                        help="also count draw calls per drawing class (uses --alloc-frames frames)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', metavar='FILE', help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    names = args.rooms or (list(WORST_CASES) if args.worst else list(game.create_rooms()))
+    unknown = set(names) - set(game.create_rooms())
+    if unknown:
+        parser.error(f"no such room: {', '.join(sorted(unknown))}")
+    screen = pygame.display.set_mode((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+
+    rooms = {}
+    for name in names:
+        result = time_room(name, args.frames, args.warmup, args.seed, screen)
+        if args.alloc_frames:
+            result['alloc_per_frame'] = allocations(name, args.alloc_frames, args.warmup, args.seed, screen)
+        if args.draw_calls:
+            result['draw_calls'] = draw_calls(name, args.alloc_frames or 300, args.warmup, args.seed, screen)
+        rooms[name] = result
+        frame = result['frame_ms']
+        print(f"{name:>14}: frame p50 {frame['p50']:.3f}ms p99 {frame['p99']:.3f}ms", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': game.np.__version__ if game.np else None,
+            'machine': platform.machine(),
+            'frames': args.frames,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'rooms': rooms,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
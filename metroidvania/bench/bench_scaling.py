@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Entity-count scaling benchmark.
+
+Builds a plain one-floor room holding N of one kind of entity, for N = 10,
+100, 1,000 and 10,000, and times the World's systems on it frame by frame:
+
+    move     - World.move_system (patrol/flight engines, updaters)
+    collide  - World.collision_system (broad phase, damage handlers, removals)
+    draw     - World.render_system
+
+The knight stands in the middle swinging, so collisions and kills (and the
+removals that come with them) happen like they would in a real room.
+Fireballs get an emitter that keeps N of them in the air.
+
+For every system the table shows microseconds per entity at each size and
+the growth exponent between the two biggest sizes (time ~ N^k). k near 1 is
+linear; anything over --limit (1.2) is flagged as super-linear, e.g. an
+O(n) list.remove() per kill or a pairwise collision loop. Small sizes are
+mostly fixed per-frame cost, so only the top of the curve is judged.
+
+    python bench/bench_scaling.py
+    python bench/bench_scaling.py --kinds Enemy Fireball --sizes 100 1000 10000 --json scaling.json
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pygame  # noqa: E402
+import game  # noqa: E402
+from pools import ProjectilePool  # noqa: E402
+
+SYSTEMS = ('move', 'collide', 'draw')
+PATTERNS = list(game.PATTERNS)
+
+
+class FireballEmitter:
+    """Keeps count fireballs flying back and forth across the room"""
+    def __init__(self, count):
+        self.count = count
+        self.fireballs = ProjectilePool(game.Fireball, count)
+        self.pools = (self.fireballs,)
+        self.launched = 0
+        self.update()
+
+    def update(self):
+        self.fireballs.update()
+        while self.fireballs.count < self.count:
+            i = self.launched
+            self.launched += 1
+            direction = 1 if i % 2 else -1
+            self.fireballs.spawn(-10 if direction > 0 else game.SCREEN_WIDTH + 10,
+                                 60 + (i * 37) % 480, direction)
+
+    def draw(self, screen):
+        for fireball in self.fireballs:
+            fireball.draw(screen)
+
+
+# How to make the i-th of each kind, spread over the room
+FACTORIES = {
+    'Enemy': lambda i: game.Enemy(20 + (i * 37) % 740, 515, 40 + i % 80),
+    'Skeleton': lambda i: game.Skeleton(20 + (i * 37) % 740, 510, 40 + i % 80),
+    'FlyingEnemy': lambda i: game.FlyingEnemy(100 + (i * 37) % 600, 120 + (i * 53) % 300,
+                                              PATTERNS[i % len(PATTERNS)]),
+    'RollingEnemy': lambda i: game.RollingEnemy(20 + (i * 37) % 740, 520),
+    'Crystal': lambda i: game.Crystal(10 + (i * 37) % 770, 100 + (i * 53) % 420, game.CYAN),
+}
+KINDS = tuple(FACTORIES) + ('Fireball',)
+
+
+def make_world(kind, count):
+    world = game.World(1, fixed_point=True)
+    world.rewind = None
+    room = game.Room('start', [pygame.Rect(0, 550, 800, 50)])
+    if kind == 'Fireball':
+        room.add(FireballEmitter(count))
+    else:
+        for i in range(count):
+            room.add(FACTORIES[kind](i))
+    world.rooms['start'] = room
+    world.current_room = 'start'
+    player = world.player
+    player.x, player.y = 390, 500
+    player.has_double_jump = True
+    return world
+
+
+def measure(kind, count, screen, seconds, max_frames, warmup=10):
+    world = make_world(kind, count)
+    room, player = world.room, world.player
+    clock = time.perf_counter
+    times = {system: [] for system in SYSTEMS}
+    started = clock()
+    frame = 0
+    while frame < warmup + max_frames:
+        if frame % 12 == 0:
+            player.attack()
+        player.health = player.max_health
+        player.update(room.platform_index)
+        start = clock()
+        world.move_system(room)
+        moved = clock()
+        world.collision_system(room)
+        collided = clock()
+        world.render_system(room, screen)
+        drawn = clock()
+        if frame >= warmup:
+            times['move'].append(moved - start)
+            times['collide'].append(collided - moved)
+            times['draw'].append(drawn - collided)
+            if frame >= warmup + 5 and drawn - started > seconds:
+                break
+        frame += 1
+    result = {system: statistics.median(samples) * 1000 for system, samples in times.items()}
+    result['frames'] = len(times['move'])
+    result['killed'] = 0 if kind == 'Fireball' else count - len(room.entities)
+    return result
+
+
+def exponent(small, big, n_small, n_big):
+    if small <= 0 or big <= 0:
+        return None
+    return math.log(big / small) / math.log(n_big / n_small)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="How each system's cost grows with entity count")
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=KINDS)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000, 10000])
+    parser.add_argument('--seconds', type=float, default=1.0, help="time spent on each size (roughly)")
+    parser.add_argument('--frames', type=int, default=120, help="most frames measured per size")
+    parser.add_argument('--limit', type=float, default=1.2, help="exponent counted as super-linear")
+    parser.add_argument('--json', metavar='FILE', help="also write the numbers as JSON")
+    args = parser.parse_args()
+
+    sizes = sorted(args.sizes)
+    screen = pygame.display.set_mode((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+    report = {}
+    flagged = []
+    header = ''.join(f"{n:>10}" for n in sizes)
+    print(f"{'':<14}{'system':<9}{header}  (us per entity){'k':>8}")
+    for kind in args.kinds:
+        runs = {n: measure(kind, n, screen, args.seconds, args.frames) for n in sizes}
+        report[kind] = {'sizes': {str(n): runs[n] for n in sizes}, 'exponent': {}}
+        for system in SYSTEMS:
+            per_entity = ''.join(f"{runs[n][system] * 1000 / n:>10.2f}" for n in sizes)
+            k = exponent(runs[sizes[-2]][system], runs[sizes[-1]][system], sizes[-2], sizes[-1]) \
+                if len(sizes) > 1 else None
+            report[kind]['exponent'][system] = k
+            mark = ''
+            if k is not None and k > args.limit:
+                mark = '  SUPER-LINEAR'
+                flagged.append(f"{kind} {system} (k={k:.2f})")
+            shown = '-' if k is None else f"{k:.2f}"
+            print(f"{kind:<14}{system:<9}{per_entity}  {'':<15}{shown:>8}{mark}")
+    if flagged:
+        print("\nSuper-linear: " + ', '.join(flagged))
+    else:
+        print("\nEverything scales linearly (or better) at the top of the curve")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'sizes': sizes, 'limit': args.limit, 'kinds': report, 'flagged': flagged}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Memory and attribute-access benchmark for the __slots__ entity classes.
+
+"Before" numbers come from a plain __dict__ copy of each class built at
+runtime, so both columns are measured in the same process.
+
+Run from the metroidvania folder:
+    python bench/bench_slots.py
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import game  # noqa: E402
+
+COUNT = 10000
+
+# How to build one of each entity
+FACTORIES = {
+    'Player': lambda cls: cls(100, 300),
+    'Enemy': lambda cls: cls(200, 515, 100),
+    'Skeleton': lambda cls: cls(250, 510, 120),
+    'FlyingEnemy': lambda cls: cls(250, 450, 'circle'),
+    'RollingEnemy': lambda cls: cls(200, 520),
+    'EliteKnight': lambda cls: cls(300, 500, 150),
+    'Fireball': lambda cls: cls(350, 240, 1),
+    'BoneProjectile': lambda cls: cls(380, 500, 1),
+    'Shockwave': lambda cls: cls(350, 550, 1),
+    'Item': lambda cls: cls(445, 310, 'double_jump', game.GREEN),
+    'Crystal': lambda cls: cls(100, 490, game.CYAN),
+}
+
+
+def dict_version(cls):
+    """Same methods as cls, but instances keep their attributes in a __dict__"""
+    body = {}
+    for klass in reversed(cls.__mro__[:-1]):
+        skip = set(klass.__slots__) | {'__slots__', '__dict__', '__weakref__'}
+        body.update((k, v) for k, v in klass.__dict__.items() if k not in skip)
+    return type(cls.__name__, (object,), body)
+
+
+def bytes_per_entity(make):
+    """Average bytes allocated per instance (includes its rect and hitbox)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    entities = [make() for _ in range(COUNT)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    # The list holding them isn't part of the entity
+    total -= sys.getsizeof(entities)
+    return total / COUNT
+
+
+def ns_per_access(entity):
+    """Nanoseconds for one read + write of entity.x"""
+    loops = 200000
+    seconds = min(timeit.repeat('e.x = e.x + 1', globals={'e': entity}, number=loops, repeat=5))
+    return seconds / loops * 1e9
+
+
+def main():
+    print(f"{'class':<16}{'bytes dict':>12}{'bytes slots':>13}{'saved':>8}{'ns dict':>10}{'ns slots':>10}")
+    for name, factory in FACTORIES.items():
+        slotted = getattr(game, name)
+        plain = dict_version(slotted)
+        # Warm up so one-off allocations (caches, interned names) aren't counted
+        factory(plain), factory(slotted)
+        mem_before = bytes_per_entity(lambda: factory(plain))
+        mem_after = bytes_per_entity(lambda: factory(slotted))
+        speed_before = ns_per_access(factory(plain))
+        speed_after = ns_per_access(factory(slotted))
+        saved = 1 - mem_after / mem_before
+        print(f"{name:<16}{mem_before:>12.0f}{mem_after:>13.0f}{saved:>7.0%}"
+              f"{speed_before:>10.1f}{speed_after:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
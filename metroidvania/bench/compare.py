@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Performance regression gate.
+
+Compares benchmark JSON (bench_rooms.py or bench_scaling.py --json) from a
+stored baseline against a new run and exits 1 if anything got slower than
+the noise allows, so it can sit in a pre-merge hook:
+
+    python bench/bench_rooms.py --worst --out baseline.json     # once, on main
+    python bench/compare.py baseline.json --run 5               # on the branch
+
+Timings are noisy, so a single number on each side proves little. Both
+sides can be several runs of the same benchmark (several files, or --run N
+to run bench_rooms.py N times right now), and each metric is judged on the
+medians of its runs. The spread between runs is measured with the median
+absolute deviation (MAD, scaled by 1.4826 to be comparable to a standard
+deviation), and a metric only counts as a regression if
+
+    new median - baseline median > baseline median * tolerance + floor + sigmas * spread
+
+where spread is the bigger MAD of the two sides. The tolerance and floor
+depend on the metric (p99s are given more room than medians), see RULES.
+With one run on each side the spread is 0 and only the tolerance applies.
+
+Several runs can be kept in one file with --save, which is the easiest way
+to make a baseline with repeats:
+
+    python bench/compare.py --run 5 --save baseline.json
+
+Exit codes: 0 no regressions, 1 regressions, 2 nothing to compare.
+Everything runs locally; nothing is fetched.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (metric pattern, relative tolerance, absolute floor). The first match wins;
+# metrics matching nothing are ignored. Every metric here is a cost: higher is worse.
+RULES = (
+    ('rooms/*/*_ms/p50', 0.10, 0.01),
+    ('rooms/*/*_ms/mean', 0.10, 0.01),
+    ('rooms/*/*_ms/p90', 0.15, 0.02),
+    ('rooms/*/*_ms/p99', 0.25, 0.05),
+    ('rooms/*/alloc_per_frame/blocks', 0.0, 0.5),
+    ('rooms/*/alloc_per_frame/peak_kb', 0.20, 1.0),
+    ('rooms/*/alloc_per_frame/gc_gen0', 0.20, 0.01),
+    ('kinds/*/sizes/*/move', 0.15, 0.01),
+    ('kinds/*/sizes/*/collide', 0.15, 0.01),
+    ('kinds/*/sizes/*/draw', 0.15, 0.01),
+    ('kinds/*/exponent/*', 0.0, 0.15),
+)
+MAD_SCALE = 1.4826
+
+
+def flatten(data, prefix=''):
+    """{'rooms': {'dragon': {'frame_ms': {'p50': 1.2}}}} -> {'rooms/dragon/frame_ms/p50': 1.2}"""
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + '/'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def rule_for(metric):
+    for pattern, tolerance, floor in RULES:
+        if fnmatch.fnmatchcase(metric, pattern):
+            return tolerance, floor
+    return None
+
+
+def load_runs(paths):
+    """Every benchmark run in the files, flattened. A file is one run or {"runs": [...]}"""
+    runs = []
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        for run in data.get('runs', [data]):
+            runs.append(run)
+    return runs
+
+
+def run_benchmark(times, bench_args):
+    """Run bench_rooms.py `times` times and return the runs"""
+    runs = []
+    with tempfile.TemporaryDirectory() as folder:
+        for i in range(times):
+            out = os.path.join(folder, f"run{i}.json")
+            subprocess.run([sys.executable, os.path.join(HERE, 'bench_rooms.py'), *bench_args, '--out', out],
+                           check=True)
+            with open(out) as f:
+                runs.append(json.load(f))
+    return runs
+
+
+def mad(values):
+    middle = statistics.median(values)
+    return statistics.median(abs(value - middle) for value in values) * MAD_SCALE
+
+
+def compare(baseline, current, sigmas=3.0, scale=1.0):
+    """One row per metric both sides have: medians, spread, allowance and verdict"""
+    base = [flatten(run) for run in baseline]
+    new = [flatten(run) for run in current]
+    shared = set.intersection(*(set(run) for run in base + new))
+    rows = []
+    for metric in sorted(shared):
+        rule = rule_for(metric)
+        if rule is None:
+            continue
+        tolerance, floor = rule
+        before = [run[metric] for run in base]
+        after = [run[metric] for run in new]
+        old, now = statistics.median(before), statistics.median(after)
+        spread = max(mad(before), mad(after))
+        allowed = (abs(old) * tolerance + floor) * scale + sigmas * spread
+        delta = now - old
+        if delta > allowed:
+            verdict = 'REGRESSION'
+        elif -delta > allowed:
+            verdict = 'improved'
+        else:
+            verdict = 'ok'
+        rows.append({
+            'metric': metric,
+            'baseline': old,
+            'current': now,
+            'delta': delta,
+            'percent': delta / old * 100 if old else None,
+            'spread': spread,
+            'allowed': allowed,
+            'verdict': verdict,
+        })
+    return rows
+
+
+def check_meta(baseline, current):
+    """Warnings for runs that weren't made the same way (numbers won't be comparable)"""
+    warnings = []
+    for key in ('python', 'pygame', 'numpy', 'machine', 'frames', 'warmup', 'seed', 'sizes'):
+        before = {json.dumps(run.get('meta', run).get(key)) for run in baseline}
+        after = {json.dumps(run.get('meta', run).get(key)) for run in current}
+        if before != after:
+            warnings.append(f"{key} differs: baseline {', '.join(sorted(before))}, current {', '.join(sorted(after))}")
+    return warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a benchmark run is slower than the baseline")
+    parser.add_argument('baseline', nargs='?', help="baseline JSON (one run or several, see --save)")
+    parser.add_argument('current', nargs='*', help="new runs to judge (or use --run)")
+    parser.add_argument('--baseline-runs', nargs='+', default=[], metavar='FILE',
+                        help="more baseline runs, as separate files")
+    parser.add_argument('--run', type=int, metavar='N', help="run bench_rooms.py N times for the current side")
+    parser.add_argument('--bench-args', default='--worst --frames 600 --alloc-frames 0',
+                        help="arguments for bench_rooms.py with --run (default: %(default)s)")
+    parser.add_argument('--sigmas', type=float, default=3.0, help="how many MADs of noise to allow")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply every tolerance, e.g. 2 on a noisy box")
+    parser.add_argument('--save', metavar='FILE', help="write the current runs to FILE (e.g. as a new baseline)")
+    parser.add_argument('--json', metavar='FILE', help="write the comparison as JSON")
+    parser.add_argument('--all', action='store_true', help="list every metric, not just the ones that moved")
+    args = parser.parse_args()
+
+    current = load_runs(args.current)
+    if args.run:
+        current += run_benchmark(args.run, args.bench_args.split())
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'runs': current}, f, indent=1)
+        print(f"Saved {len(current)} runs to {args.save}")
+    baseline = load_runs(([args.baseline] if args.baseline else []) + args.baseline_runs)
+    if not baseline or not current:
+        if args.save and not baseline:
+            return 0
+        print("Need a baseline and at least one current run", file=sys.stderr)
+        return 2
+
+    for warning in check_meta(baseline, current):
+        print(f"warning: {warning}", file=sys.stderr)
+    rows = compare(baseline, current, args.sigmas, args.scale)
+    if not rows:
+        print("No metrics in common", file=sys.stderr)
+        return 2
+
+    regressions = [row for row in rows if row['verdict'] == 'REGRESSION']
+    shown = rows if args.all else [row for row in rows if row['verdict'] != 'ok']
+    print(f"{len(baseline)} baseline runs, {len(current)} current runs, {len(rows)} metrics")
+    for row in sorted(shown, key=lambda row: -(row['percent'] or 0)):
+        percent = '' if row['percent'] is None else f" ({row['percent']:+.1f}%)"
+        print(f"{row['verdict']:>10}  {row['metric']:<44} {row['baseline']:>9.3f} -> {row['current']:>9.3f}"
+              f"{percent}, allowed +{row['allowed']:.3f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'baseline_runs': len(baseline), 'current_runs': len(current),
+                       'regressions': len(regressions), 'metrics': rows}, f, indent=1)
+    if regressions:
+        print(f"{len(regressions)} regressions")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Collision system for Knight's Adventure.
+
+Every thing that can touch something else registers a Hitbox with a layer
+(what it is) and a mask (what it wants to hit). A sort-and-sweep broad phase
+finds overlapping pairs and hands them to the handler for that layer pair.
+"""
+
+# Layers (bit flags so masks can combine them)
+PLAYER = 1
+PLAYER_ATTACK = 2
+ENEMY = 4
+ENEMY_PROJECTILE = 8
+PICKUP = 16
+
+
+class Hitbox:
+    """A rect plus who owns it and which layers it collides with"""
+    __slots__ = ('owner', 'rect', 'layer', 'mask')
+
+    def __init__(self, owner, rect, layer, mask):
+        self.owner = owner
+        self.rect = rect
+        self.layer = layer
+        self.mask = mask
+
+
+class CollisionWorld:
+    """Collects hitboxes for one frame and dispatches overlapping pairs"""
+    def __init__(self):
+        self.hitboxes = []
+        self.handlers = {}
+        self.layer_pairs = []  # Unordered layer pairs that have a handler
+
+    def on(self, layer_a, layer_b, handler):
+        """Call handler(owner_a, owner_b) whenever layer_a touches layer_b"""
+        self.handlers[(layer_a, layer_b)] = handler
+        pair = (min(layer_a, layer_b), max(layer_a, layer_b))
+        if pair not in self.layer_pairs:
+            self.layer_pairs.append(pair)
+
+    def clear(self):
+        self.hitboxes.clear()
+
+    def add(self, hitbox):
+        self.hitboxes.append(hitbox)
+
+    def pairs(self):
+        """Overlapping pairs whose layers have a handler, as (earlier, later) in x order.
+
+        Boxes are sorted on x once and split by layer, then each layer pair
+        with a handler gets its own sort-and-sweep. Layers nobody handles
+        (enemy against enemy, fireball against fireball) are never compared,
+        so a room full of enemies costs about one test per box per knight
+        instead of one per pair of enemies. The pairs come back in the order a
+        single sweep over every box would find them (by the later box, then
+        the earlier), so handlers run in the same order as they always have.
+        """
+        boxes = sorted(self.hitboxes, key=lambda box: box.rect.left)
+        layers = {}
+        for rank, box in enumerate(boxes):
+            layers.setdefault(box.layer, []).append((rank, box))
+        found = []
+        for layer_a, layer_b in self.layer_pairs:
+            first = layers.get(layer_a)
+            second = layers.get(layer_b)
+            if not first or not second:
+                continue
+            if layer_a == layer_b:
+                sweep_one(first, found)
+            else:
+                sweep_two(first, second, found)
+        found.sort(key=lambda pair: (pair[0], pair[1]))
+        return [(other, box) for _, _, other, box in found]
+
+    def dispatch(self):
+        """Run the handler for every colliding pair, in (a, b) handler order"""
+        handlers = self.handlers
+        for first, second in self.pairs():
+            handler = handlers.get((first.layer, second.layer))
+            if handler:
+                handler(first.owner, second.owner)
+                continue
+            handler = handlers.get((second.layer, first.layer))
+            if handler:
+                handler(second.owner, first.owner)
+
+
+def prune(active, left):
+    """Drop the boxes that end before left, in place"""
+    kept = 0
+    for entry in active:
+        if entry[1].rect.right > left:
+            active[kept] = entry
+            kept += 1
+    del active[kept:]
+
+
+def touching(rank, box, active, found):
+    rect = box.rect
+    for other_rank, other in active:
+        if (box.layer & other.mask and other.layer & box.mask
+                and rect.colliderect(other.rect)):
+            found.append((rank, other_rank, other, box))
+
+
+def sweep_one(boxes, found):
+    """Sweep a layer against itself"""
+    active = []
+    for rank, box in boxes:
+        prune(active, box.rect.left)
+        touching(rank, box, active, found)
+        active.append((rank, box))
+
+
+def sweep_two(first, second, found):
+    """Sweep two layers (each sorted on x) against each other only"""
+    active_first = []
+    active_second = []
+    i = j = 0
+    ends = len(first), len(second)
+    while i < ends[0] or j < ends[1]:
+        if j == ends[1] or (i < ends[0] and first[i][0] < second[j][0]):
+            rank, box = first[i]
+            i += 1
+            mine, theirs = active_first, active_second
+        else:
+            rank, box = second[j]
+            j += 1
+            mine, theirs = active_second, active_first
+        if theirs:
+            prune(theirs, box.rect.left)
+            touching(rank, box, theirs, found)
+        mine.append((rank, box))
@@ -0,0 +1,156 @@
+"""
+Draw-call counter for Knight's Adventure.
+
+Everything in the game is drawn with pygame.draw (a Dragon is a few dozen
+rects, circles and polygons every frame), which is fine until a room has
+too many of them. Before baking sprites onto cached surfaces it helps to
+know which draw() methods are the expensive ones, so while a DrawStats is
+installed every pygame.draw.rect/circle/ellipse/line/polygon/arc call and
+every blit to the screen is counted, along with the pixels it touched (the
+area of the rect pygame returns), and charged to whoever called it:
+
+    Dragon       - the innermost draw method on the stack, by class
+    HUD          - World.draw's own calls (hearts, coin counter, message box)
+    minimap      - draw_minimap()
+    platforms    - the room's platforms in World.render_system
+
+Finding the caller means looking up the stack on every call, which is slow,
+but it's a debug mode. Off (the default) means off: install() swaps the
+wrapped functions into pygame.draw and uninstall() puts the originals back,
+so when it isn't installed nothing is wrapped at all.
+
+Surface is a C type, so blit can't be patched on it. Instead screen() hands
+out a stand-in for the display surface that counts its own blits and passes
+everything else straight through, and the wrapped draw functions unwrap it
+before calling pygame.
+
+F4 in the game turns it on and off and prints the table when it goes off;
+bench/bench_rooms.py --draw-calls puts the same numbers in its JSON.
+"""
+
+import sys
+
+import pygame
+
+WRAPPED = ('rect', 'circle', 'ellipse', 'line', 'polygon', 'arc')
+
+# Draw functions that aren't a class's draw(), and what to call them
+LABELS = {
+    'World.draw': 'HUD',
+    'draw_heart': 'HUD',
+    'draw_minimap': 'minimap',
+    'World.render_system': 'platforms',
+}
+
+
+def label_for(code, obj):
+    if obj is None:
+        name = code.co_name
+    else:
+        name = f"{type(obj).__name__}.{code.co_name}"
+    if name in LABELS:
+        return LABELS[name]
+    return name[:-len('.draw')] if name.endswith('.draw') else name
+
+
+class CountingScreen:
+    """Stands in for the screen while counting: blits are counted, the rest passes through"""
+    __slots__ = ('surface', 'stats')
+    
+    def __init__(self, surface, stats):
+        self.surface = surface
+        self.stats = stats
+    
+    def blit(self, source, dest, area=None, special_flags=0):
+        rect = self.surface.blit(source, dest, area, special_flags)
+        self.stats.count(rect, 'blit')
+        return rect
+    
+    def __getattr__(self, name):
+        return getattr(self.surface, name)
+
+
+class DrawStats:
+    """Counts draw calls and pixels per drawing class while installed"""
+    def __init__(self):
+        self.originals = {}
+        self.frames = 0
+        self.totals = {}  # label -> [calls, pixels]
+        self.kinds = {}   # call kind -> calls
+    
+    @property
+    def installed(self):
+        return bool(self.originals)
+    
+    def install(self):
+        if self.originals:
+            return
+        self.frames = 0
+        self.totals = {}
+        self.kinds = {}
+        for name in WRAPPED:
+            original = getattr(pygame.draw, name)
+            self.originals[name] = original
+            setattr(pygame.draw, name, self.wrap(original, name))
+    
+    def uninstall(self):
+        for name, original in self.originals.items():
+            setattr(pygame.draw, name, original)
+        self.originals = {}
+    
+    def wrap(self, draw, kind):
+        count = self.count
+        
+        def counted(surface, *args, **kwargs):
+            if type(surface) is CountingScreen:
+                surface = surface.surface
+            rect = draw(surface, *args, **kwargs)
+            count(rect, kind)
+            return rect
+        counted.__name__ = draw.__name__
+        counted.__doc__ = draw.__doc__
+        return counted
+    
+    def screen(self, surface):
+        """What to draw on this frame: surface itself unless counting"""
+        return CountingScreen(surface, self) if self.originals else surface
+    
+    def count(self, rect, kind):
+        # Up past the wrapper to the first draw-ish function
+        frame = sys._getframe(2)
+        label = '?'
+        while frame is not None:
+            code = frame.f_code
+            if code.co_name.startswith('draw') or code.co_name == 'render_system':
+                obj = frame.f_locals.get('self') if code.co_varnames[:1] == ('self',) else None
+                label = label_for(code, obj)
+                break
+            frame = frame.f_back
+        entry = self.totals.get(label)
+        if entry is None:
+            entry = self.totals[label] = [0, 0]
+        entry[0] += 1
+        entry[1] += rect.width * rect.height
+        self.kinds[kind] = self.kinds.get(kind, 0) + 1
+    
+    def end_frame(self):
+        if self.originals:
+            self.frames += 1
+    
+    def report(self):
+        """{label: {'calls': per frame, 'kpixels': per frame, 'share': of all pixels}}, biggest first"""
+        frames = max(self.frames, 1)
+        pixels = sum(entry[1] for entry in self.totals.values()) or 1
+        rows = sorted(self.totals.items(), key=lambda item: -item[1][1])
+        return {label: {'calls': calls / frames, 'kpixels': touched / frames / 1000, 'share': touched / pixels}
+                for label, (calls, touched) in rows}
+    
+    def table(self):
+        lines = [f"Draw calls over {self.frames} frames (per frame):",
+                 f"{'':>18} {'calls':>8} {'kpixels':>9} {'share':>7}"]
+        for label, row in self.report().items():
+            lines.append(f"{label:>18} {row['calls']:>8.1f} {row['kpixels']:>9.1f} {row['share']:>7.1%}")
+        kinds = ', '.join(f"{kind} {calls / max(self.frames, 1):.1f}"
+                          for kind, calls in sorted(self.kinds.items(), key=lambda item: -item[1]))
+        lines.append(f"{'by call':>18} {kinds}")
+        return '\n'.join(lines)
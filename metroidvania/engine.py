@@ -0,0 +1,107 @@
+"""
+Structure-of-arrays bookkeeping for Knight's Adventure.
+
+The patrol and flight engines (patrol.py, motion.py) keep every walker or
+flyer in a room as columns of NumPy arrays and move them all in one step.
+Everything apart from the step is the same for both and lives here: adding
+members, growing the arrays, writing a member's attributes back in after
+something outside changed them, and swap-removing.
+
+Each member is a Proxy: a plain object whose attributes mirror its slot in
+the arrays, so the rest of the game reads enemy.x like any other attribute.
+An engine copies new values onto its members after each step; anything that
+changes a member from outside has to call engine.write(member) afterwards,
+which Proxy.take_damage() already does.
+
+Rooms the knight isn't in only need their members up to date when something
+looks at them (a snapshot, the state hash, walking in), so step(publish=False)
+leaves the members alone and marks the engine stale, and sync() publishes
+everything later if it's still needed.
+
+An Engine subclass lists the member attributes it owns in `fields` and may
+add columns only it uses in `extra` (kept in step with the rest, but never
+copied from the members - its write() fills them in).
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Proxy:
+    """Base for things an Engine moves"""
+    __slots__ = ('_engine', '_slot')
+
+    def __init__(self):
+        self._engine = None
+        self._slot = -1
+
+    def take_damage(self):
+        self.health -= 1
+        self.hit_flash = 10
+        if self._engine is not None:
+            self._engine.write(self)
+        return self.health <= 0
+
+
+class Engine:
+    """Structure-of-arrays state for a room's members.
+
+    Subclasses (PatrolEngine, FlightEngine) add the part that moves them:
+    step(frames=1, publish=True) runs every member that many frames and then
+    publishes, or with publish=False only sets stale; publish(turned=None,
+    flashed=None) copies the arrays onto the members and clears stale, where
+    turned and flashed mask the members whose direction and hit_flash changed
+    (None: all of them).
+    """
+    fields = ()  # (attribute, dtype) pairs copied from each member
+    extra = ()   # (column, dtype) pairs only the engine uses
+
+    def __init__(self, members=(), capacity=16):
+        self.count = 0
+        self.stale = False  # Members are behind the arrays
+        self.capacity = capacity
+        self.members = []
+        self.arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.fields + self.extra}
+        for member in members:
+            self.add(member)
+
+    def add(self, member):
+        if self.count == self.capacity:
+            # Out of room: double every array
+            self.capacity *= 2
+            for name, array in self.arrays.items():
+                grown = np.zeros(self.capacity, dtype=array.dtype)
+                grown[:self.count] = array
+                self.arrays[name] = grown
+        member._engine, member._slot = self, self.count
+        self.members.append(member)
+        self.count += 1
+        self.write(member)
+
+    def write(self, member):
+        """Copy a member's attributes into the arrays after outside changes"""
+        slot = member._slot
+        arrays = self.arrays
+        for name, _ in self.fields:
+            arrays[name][slot] = getattr(member, name)
+
+    def remove(self, member):
+        """Swap-remove: the last member moves into the freed slot"""
+        slot = member._slot
+        member._engine, member._slot = None, -1
+        last = self.count - 1
+        if slot != last:
+            for array in self.arrays.values():
+                array[slot] = array[last]
+            moved = self.members[last]
+            moved._slot = slot
+            self.members[slot] = moved
+        self.members.pop()
+        self.count -= 1
+
+    def sync(self):
+        """Publish everything if a step skipped it"""
+        if self.stale:
+            self.publish()
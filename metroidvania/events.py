@@ -0,0 +1,371 @@
+"""
+Game events for Knight's Adventure.
+
+Combat, pickups, the shop and doors used to write an f-string into
+world.message (and set world.message_timer) on the spot, even when another
+hit replaced it later in the same frame. Now they emit a small typed event
+on the world's EventBus and whoever cares listens:
+
+    Hud          - the message box; the newest event wins, like before
+    Audio        - a sound per event type, if there's a sounds/ folder
+    Telemetry    - counts per event type, per room and per enemy
+    Achievements - milestones across the whole session
+
+An event is only turned into text when the HUD is asked for it (drawing,
+or a snapshot saving it), so only the one on screen ever gets formatted.
+
+Netplay rollback re-runs frames. The HUD is part of the game state and
+sees those frames again, but the other listeners are registered with
+replays=False and skip them while bus.replaying is set, so a re-run hit
+doesn't play twice or get counted twice.
+"""
+
+import os
+from collections import Counter
+
+
+class Event:
+    """Something that happened. duration is how many frames the HUD shows
+    it for (0 keeps whatever's up already)"""
+    __slots__ = ()
+    duration = 0
+
+    def format(self):
+        return ""
+
+
+class Notice(Event):
+    """Fixed text: tutorials, locked doors, falling off the obby"""
+    __slots__ = ('text', 'duration')
+
+    def __init__(self, text, duration):
+        self.text = text
+        self.duration = duration
+
+    def format(self):
+        return self.text
+
+
+class EnemyHit(Event):
+    """A hit that didn't kill (only bosses and elites report these)"""
+    __slots__ = ('name', 'health', 'max_health', 'boss')
+    duration = 60
+
+    def __init__(self, name, health, max_health, boss=False):
+        self.name = name
+        self.health = health
+        self.max_health = max_health
+        self.boss = boss
+
+    def format(self):
+        if self.boss:
+            return f"{self.name} hit! Health: {self.health}/{self.max_health}"
+        return f"Elite hit! {self.health}/{self.max_health} HP left"
+
+
+class EnemyKilled(Event):
+    __slots__ = ('name',)
+    duration = 60
+
+    def __init__(self, name):
+        self.name = name
+
+    def format(self):
+        return f"{self.name} defeated!"
+
+
+class BossDefeated(Event):
+    __slots__ = ('name',)
+    duration = 200
+
+    def __init__(self, name):
+        self.name = name
+
+    def format(self):
+        if self.name == "Dragon":
+            return "🐉 DRAGON DEFEATED! Dash unlocked! Press D!"
+        return f"💀 {self.name.upper()} DEFEATED!"
+
+
+class PlayerHit(Event):
+    """source is the enemy or projectile's name"""
+    __slots__ = ('source', 'health', 'max_health', 'projectile')
+    duration = 90
+
+    def __init__(self, source, health, max_health, projectile=False):
+        self.source = source
+        self.health = health
+        self.max_health = max_health
+        self.projectile = projectile
+
+    def format(self):
+        health = f"Health: {self.health}/{self.max_health}"
+        if not self.projectile:
+            return f"Hit by {self.source.lower()}! {health}"
+        if self.source == "Shockwave":
+            return f"Shockwave! Jump to avoid! {health}"
+        return f"{self.source}! {health}"
+
+
+ITEM_TEXT = {
+    'double_jump': "DOUBLE JUMP unlocked! Press UP twice!",
+    'dash': "DASH UNLOCKED! Press D to dash!",
+    'map': "MAP ACQUIRED! Now you can see where you are!",
+    'heart_upgrade': "MAX HEALTH +1!",
+}
+
+
+class ItemCollected(Event):
+    __slots__ = ('item_type',)
+    duration = 180
+
+    def __init__(self, item_type):
+        self.item_type = item_type
+
+    def format(self):
+        return ITEM_TEXT[self.item_type]
+
+
+class Purchase(Event):
+    """Trying to buy from the shopkeeper; bought is False if coins ran short"""
+    __slots__ = ('item', 'cost', 'coins', 'bought')
+
+    def __init__(self, item, cost, coins, bought):
+        self.item = item
+        self.cost = cost
+        self.coins = coins
+        self.bought = bought
+
+    @property
+    def duration(self):
+        return 150 if self.bought else 120
+
+    def format(self):
+        if self.bought:
+            return f"Bought {self.item}! ({self.cost} coins) Coins: {self.coins}"
+        return f"{self.item} costs {self.cost} coins. You have {self.coins}"
+
+
+# Banners for going forward through a door: (from, to) -> (text, frames)
+BANNERS = {
+    ('start', 'item'): ("Treasure chamber...", 90),
+    ('item', 'knights'): ("Black knights ahead! Use X to attack!", 120),
+    ('knights', 'elite1'): ("ELITE KNIGHT! Watch out for jumps!", 150),
+    ('elite1', 'elite2'): ("TWO Elite Knights! Be careful!", 150),
+    ('elite2', 'dragon'): ("THE DRAGON! Attack with X! Jump over shockwaves!", 180),
+    ('dragon', 'obby'): ("You defeated the dragon! PARKOUR TIME!", 180),
+    ('obby', 'cartographer'): ("Cartographer's Room!", 120),
+    ('obby', 'skeletons'): ("SKELETONS! 💀", 120),
+    ('skeletons', 'skeleton_boss'): ("SKELETON BOSS!", 150),
+    ('skeleton_boss', 'treasure'): ("Treasure!", 120),
+    ('treasure', 'shop'): ("Shop! Press X near merchant!", 150),
+    ('shop', 'cliffs'): ("THE CLIFFS! Flying enemies!", 150),
+    ('cliffs', 'crystal_plains'): ("Crystal Plains!", 120),
+}
+
+
+class RoomEntered(Event):
+    __slots__ = ('room', 'came_from')
+
+    def __init__(self, room, came_from):
+        self.room = room
+        self.came_from = came_from
+
+    @property
+    def duration(self):
+        banner = BANNERS.get((self.came_from, self.room))
+        return banner[1] if banner else 0
+
+    def format(self):
+        return BANNERS[(self.came_from, self.room)][0]
+
+
+class EventBus:
+    """Hands each emitted event to the listeners for its type"""
+    def __init__(self):
+        self.listeners = {}  # event type -> [(listener, replays)]
+        self.everything = []
+        self.replaying = False  # Set while rollback re-runs frames
+
+    def on(self, kind, listener, replays=True):
+        """Call listener(event) for every event of type kind (Event for all of them)"""
+        if kind is Event:
+            self.everything.append((listener, replays))
+        else:
+            self.listeners.setdefault(kind, []).append((listener, replays))
+
+    def emit(self, event):
+        replaying = self.replaying
+        for listener, replays in self.listeners.get(type(event), ()):
+            if replays or not replaying:
+                listener(event)
+        for listener, replays in self.everything:
+            if replays or not replaying:
+                listener(event)
+
+
+class Hud:
+    """The message box. Keeps the newest event with a duration, unformatted"""
+    def __init__(self, bus=None):
+        self.event = None
+        self.timer = 0
+        self._text = ""
+        if bus is not None:
+            bus.on(Event, self.show)
+
+    def show(self, event):
+        duration = event.duration
+        if duration:
+            self.event = event
+            self.timer = duration
+            self._text = None
+
+    def tick(self):
+        if self.timer > 0:
+            self.timer -= 1
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.event.format()
+        return self._text
+
+    def restore(self, text, timer):
+        """Put back a message from a snapshot"""
+        self.event = Notice(text, timer)
+        self.timer = timer
+        self._text = text
+
+
+class Audio:
+    """Plays sounds/<name>.wav for each event type that has one. Silent if
+    the folder or the mixer isn't there"""
+    SOUNDS = {
+        EnemyHit: 'enemy_hit',
+        EnemyKilled: 'enemy_killed',
+        BossDefeated: 'boss_defeated',
+        PlayerHit: 'player_hit',
+        ItemCollected: 'item_collected',
+        Purchase: 'purchase',
+        RoomEntered: 'door',
+    }
+    FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sounds')
+
+    def __init__(self, bus, folder=FOLDER):
+        self.folder = folder
+        self.sounds = {}  # name -> Sound, or None if it couldn't be loaded
+        for kind in self.SOUNDS:
+            bus.on(kind, self.play, replays=False)
+
+    def play(self, event):
+        name = self.SOUNDS[type(event)]
+        if name not in self.sounds:
+            self.sounds[name] = self.load(name)
+        sound = self.sounds[name]
+        if sound is not None:
+            sound.play()
+
+    def load(self, name):
+        path = os.path.join(self.folder, name + '.wav')
+        if not os.path.exists(path):
+            return None
+        import pygame
+        if not pygame.mixer.get_init():
+            return None
+        try:
+            return pygame.mixer.Sound(path)
+        except pygame.error:
+            return None
+
+
+class Telemetry:
+    """Counts what happened, overall, per room and per enemy"""
+    def __init__(self, bus, room='start'):
+        self.room = room
+        self.events = Counter()  # Event class -> count
+        self.rooms = {}  # room -> Counter of event classes
+        self.kills = Counter()
+        bus.on(Event, self.record, replays=False)
+
+    def record(self, event):
+        kind = type(event)
+        if isinstance(event, RoomEntered):
+            self.room = event.room
+        elif isinstance(event, (EnemyKilled, BossDefeated)):
+            self.kills[event.name] += 1
+        self.events[kind] += 1
+        counts = self.rooms.get(self.room)
+        if counts is None:
+            counts = self.rooms[self.room] = Counter()
+        counts[kind] += 1
+
+    def summary(self):
+        return {
+            'events': {kind.__name__: count for kind, count in self.events.items()},
+            'rooms': {room: {kind.__name__: count for kind, count in counts.items()}
+                      for room, counts in self.rooms.items()},
+            'kills': dict(self.kills),
+        }
+
+
+class Achievements:
+    """Milestones for the whole session (they survive restarts).
+    rooms is the world's reachable rooms, for what there is to visit and collect.
+    on_unlock(name, description) is called once for each"""
+    LIST = {
+        'first_blood': "Defeat an enemy",
+        'knight_errant': "Defeat 25 enemies",
+        'dragon_slayer': "Defeat the dragon",
+        'bone_breaker': "Defeat the skeleton boss",
+        'untouchable': "Defeat a boss without getting hit in its room",
+        'collector': "Collect every power-up in the castle",
+        'explorer': "Visit every room",
+    }
+
+    def __init__(self, bus, rooms, on_unlock=None):
+        self.rooms = set(rooms)
+        self.power_ups = {entity.item_type for room in rooms.values()
+                          for entity in room.entities if hasattr(entity, 'item_type')}
+        self.on_unlock = on_unlock
+        self.unlocked = []
+        self.kills = 0
+        self.items = set()
+        self.visited = {'start'}
+        self.hit_here = False
+        bus.on(EnemyKilled, self.enemy_killed, replays=False)
+        bus.on(BossDefeated, self.boss_defeated, replays=False)
+        bus.on(PlayerHit, self.player_hit, replays=False)
+        bus.on(ItemCollected, self.item_collected, replays=False)
+        bus.on(RoomEntered, self.room_entered, replays=False)
+
+    def unlock(self, name):
+        if name in self.unlocked:
+            return
+        self.unlocked.append(name)
+        if self.on_unlock is not None:
+            self.on_unlock(name, self.LIST[name])
+
+    def enemy_killed(self, event):
+        self.kills += 1
+        self.unlock('first_blood')
+        if self.kills >= 25:
+            self.unlock('knight_errant')
+
+    def boss_defeated(self, event):
+        self.unlock('dragon_slayer' if event.name == "Dragon" else 'bone_breaker')
+        if not self.hit_here:
+            self.unlock('untouchable')
+
+    def player_hit(self, event):
+        self.hit_here = True
+
+    def item_collected(self, event):
+        self.items.add(event.item_type)
+        if self.items >= self.power_ups:
+            self.unlock('collector')
+
+    def room_entered(self, event):
+        self.hit_here = False
+        self.visited.add(event.room)
+        if self.visited >= self.rooms:
+            self.unlock('explorer')
@@ -9,6 +9,30 @@ import pygame
 import sys
 import math
 import random
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+
+from pools import ProjectilePool
+from snapshot import StateLayout, save_world, restore_world
+from rewind import RewindBuffer
+from replay import Recording, read_input, IN_LEFT, IN_RIGHT, IN_X_HELD, IN_UP, IN_X, IN_D, IN_R, IN_REWIND
+from patrol import Patroller, PatrolEngine, np
+from physics import Body, PlatformIndex
+from motion import Flyer, FlightEngine, PATTERNS
+import motion
+from nav import JUMP
+from scheduler import JobScheduler, HIGH, LOW
+from memory import MemoryMonitor
+from drawstats import DrawStats
+from profiler import (Profiler, Capture, INPUT, REWIND, PHYSICS, OFF_SCREEN, ENEMIES, BOSSES, COLLISIONS,
+                      TRANSITIONS, WORLD_DRAW, HUD, FLIP, JOBS)
+from events import (EventBus, Hud, Audio, Telemetry, Achievements, Notice, EnemyHit, EnemyKilled,
+                    BossDefeated, PlayerHit, ItemCollected, Purchase, RoomEntered)
+from collision import CollisionWorld, Hitbox, PLAYER, PLAYER_ATTACK, ENEMY, ENEMY_PROJECTILE, PICKUP
 
 # Initialize Pygame
 pygame.init()
@@ -18,6 +42,9 @@ SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 FPS = 60
 
+# Rooms where holding Z rewinds time
+REWIND_ROOMS = ('obby', 'dragon', 'skeleton_boss')
+
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -41,24 +68,32 @@ BROWN = (139, 69, 19)
 DARK_BROWN = (101, 50, 15)
 CYAN = (0, 255, 255)
 
+# Fixed-point physics (optional): positions and velocities get snapped to
+# 1/256 px steps. Numbers on that grid are exact in a float, so tiny rounding
+# differences between machines get squashed instead of snowballing.
+FIXED_ONE = 256
+
+def snap(value):
+    return round(value * FIXED_ONE) / FIXED_ONE
+
 class SlashEffect:
-    def __init__(self, x, y, facing_right):
+    def __init__(self, x, y, facing_right, rng=random):
         self.x = x
         self.y = y
         self.facing_right = facing_right
         self.timer = 10
         self.particles = []
         
-        # Create slash particles
+        # Create slash particles (rng is the cosmetic one, never the gameplay one)
         for i in range(8):
-            angle = random.uniform(-30, 30) if facing_right else random.uniform(150, 210)
-            speed = random.uniform(3, 8)
+            angle = rng.uniform(-30, 30) if facing_right else rng.uniform(150, 210)
+            speed = rng.uniform(3, 8)
             self.particles.append({
                 'x': x,
-                'y': y + random.randint(-10, 10),
+                'y': y + rng.randint(-10, 10),
                 'vx': math.cos(math.radians(angle)) * speed,
                 'vy': math.sin(math.radians(angle)) * speed,
-                'life': random.randint(8, 12)
+                'life': rng.randint(8, 12)
             })
     
     def update(self):
@@ -80,7 +115,20 @@ class SlashEffect:
                     color = (int(CYAN[0] * alpha), int(CYAN[1] * alpha), int(255 * alpha))
                     pygame.draw.circle(screen, color, (int(particle['x']), int(particle['y'])), size)
 
-class Player:
+class Player(Body):
+    __slots__ = ('x', 'y', 'width', 'height', 'vel_x', 'vel_y', 'speed', 'jump_power', 'gravity',
+                 'on_ground', 'has_double_jump', 'can_double_jump', 'facing_right', 'health', 'max_health',
+                 'invincible_timer', 'attacking', 'attack_timer', 'attack_cooldown', 'slash_effects',
+                 'has_dash', 'has_map', 'coins', 'sword_level', 'dashing', 'dash_timer', 'dash_cooldown',
+                 'dash_speed', 'dash_duration', 'rect', 'attack_rect', 'hitbox', 'attack_hitbox',
+                 'fx_rng', 'fixed_point', 'crest')
+    state = StateLayout(
+        ('x', 'd'), ('y', 'd'), ('vel_x', 'd'), ('vel_y', 'd'), ('on_ground', '?'),
+        ('has_double_jump', '?'), ('can_double_jump', '?'), ('facing_right', '?'),
+        ('health', 'i'), ('max_health', 'i'), ('invincible_timer', 'i'), ('attacking', '?'),
+        ('attack_timer', 'i'), ('attack_cooldown', 'i'), ('has_dash', '?'), ('has_map', '?'),
+        ('coins', 'i'), ('sword_level', 'i'), ('dashing', '?'), ('dash_timer', 'i'),
+        ('dash_cooldown', 'i'))
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -111,6 +159,14 @@ class Player:
         self.dash_cooldown = 0
         self.dash_speed = 15
         self.dash_duration = 10
+        # Persistent hitboxes, moved in place every update
+        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.attack_rect = pygame.Rect(0, 0, 35, 20)
+        self.hitbox = Hitbox(self, self.rect, PLAYER, ENEMY | ENEMY_PROJECTILE | PICKUP)
+        self.attack_hitbox = Hitbox(self, self.attack_rect, PLAYER_ATTACK, ENEMY)
+        self.fx_rng = random  # The World hands out its own seeded RNGs
+        self.fixed_point = False
+        self.crest = LIGHT_SILVER  # Helmet ridge, so co-op knights can tell who's who
         
     def update(self, platforms):
         # Update timers
@@ -144,10 +200,9 @@ class Player:
         # Move horizontally
         if self.dashing:
             # Dash movement
-            dash_vel = self.dash_speed if self.facing_right else -self.dash_speed
-            self.x += dash_vel
+            dx = self.dash_speed if self.facing_right else -self.dash_speed
         else:
-            self.x += self.vel_x
+            dx = self.vel_x
         
         # Update facing direction
         if self.vel_x > 0:
@@ -155,31 +210,10 @@ class Player:
         elif self.vel_x < 0:
             self.facing_right = False
         
-        # Check horizontal collisions
-        player_rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        for platform in platforms:
-            if player_rect.colliderect(platform):
-                if self.vel_x > 0:  # Moving right
-                    self.x = platform.left - self.width
-                elif self.vel_x < 0:  # Moving left
-                    self.x = platform.right
-        
-        # Move vertically
-        self.y += self.vel_y
-        
-        # Check vertical collisions
-        self.on_ground = False
-        player_rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        for platform in platforms:
-            if player_rect.colliderect(platform):
-                if self.vel_y > 0:  # Falling
-                    self.y = platform.top - self.height
-                    self.vel_y = 0
-                    self.on_ground = True
-                    self.can_double_jump = True
-                elif self.vel_y < 0:  # Jumping up
-                    self.y = platform.bottom
-                    self.vel_y = 0
+        # Move and collide with platforms
+        self.move(platforms, dx)
+        if self.on_ground:
+            self.can_double_jump = True
         
         # Keep player in bounds
         if self.x < 0:
@@ -190,6 +224,9 @@ class Player:
             self.take_damage()
             self.y = 300
             self.vel_y = 0
+        if self.fixed_point:
+            self.x, self.y, self.vel_y = snap(self.x), snap(self.y), snap(self.vel_y)
+        self.rect.x, self.rect.y = int(self.x), int(self.y)
     
     def jump(self):
         if self.on_ground:
@@ -205,7 +242,7 @@ class Player:
             self.attack_cooldown = 30
             # Create slash effect
             sword_x = self.x + self.width + 15 if self.facing_right else self.x - 15
-            self.slash_effects.append(SlashEffect(sword_x, self.y + 15, self.facing_right))
+            self.slash_effects.append(SlashEffect(sword_x, self.y + 15, self.facing_right, self.fx_rng))
     
 
     def dash(self):
@@ -218,9 +255,11 @@ class Player:
     def get_attack_rect(self):
         if self.attacking:
             if self.facing_right:
-                return pygame.Rect(self.x + self.width, self.y + 10, 35, 20)  # Longer reach!
+                self.attack_rect.x = int(self.x + self.width)  # Longer reach!
             else:
-                return pygame.Rect(self.x - 35, self.y + 10, 35, 20)
+                self.attack_rect.x = int(self.x - 35)
+            self.attack_rect.y = int(self.y + 10)
+            return self.attack_rect
         return None
     
     def take_damage(self):
@@ -286,7 +325,7 @@ class Player:
         pygame.draw.rect(screen, BLACK, (self.x + 6, self.y + 7, 8, 3))
         
         # Helmet top ridge
-        pygame.draw.rect(screen, LIGHT_SILVER, (self.x + 8, self.y + 2, 4, 2))
+        pygame.draw.rect(screen, self.crest, (self.x + 8, self.y + 2, 4, 2))
         
         # Long sword with swing animation
         sword_angle = 0
@@ -357,24 +396,126 @@ class Player:
             pygame.draw.rect(screen, GOLD, (base_x + 2, base_y, 2, 1))
 
 class Room:
+    """One screen of the world.
+    
+    The keyword lists are just a handy way to build a room. Everything in
+    them ends up in the same component stores, and the World's systems walk
+    those stores, so a new kind of enemy doesn't need its own loop anywhere.
+    """
     def __init__(self, name, platforms, items=None, enemies=None, elite_enemies=None, gates=None, boss=None, bench=None, skeletons=None, skeleton_boss=None, npc=None, treasure=None, shopkeeper=None, flying_enemies=None, rolling_enemies=None, crystals=None):
         self.name = name
         self.platforms = platforms
-        self.items = items if items else []
-        self.enemies = enemies if enemies else []
-        self.elite_enemies = elite_enemies if elite_enemies else []
-        self.gates = gates if gates else []
+        self.platform_index = PlatformIndex(platforms)
         self.boss = boss
         self.bench = bench
-        self.skeletons = skeletons if skeletons else []
         self.skeleton_boss = skeleton_boss
         self.npc = npc
         self.treasure = treasure
         self.shopkeeper = shopkeeper
-        self.flying_enemies = flying_enemies if flying_enemies else []
-        self.rolling_enemies = rolling_enemies if rolling_enemies else []
-        self.crystals = crystals if crystals else []
+        
+        # Component stores
+        self.entities = []     # Everything, in draw order
+        self.updaters = []     # Things that run their own update()
+        self.patrollers = []   # Back-and-forth walkers, moved together by the patrol engine
+        self.bodies = []       # Things with platform physics that chase the knights
+        self.flyers = []       # Things following a flight pattern, moved together by the flight engine
+        self.colliders = []    # Things with a hitbox
+        self.projectiles = []  # Projectile pools owned by things in this room
+        # Every patroller and every flyer moves in one vectorized step (None without NumPy)
+        self.patrol = PatrolEngine() if np else None
+        self.flight = FlightEngine() if np else None
+        
+        # Everything the room started with, and a flag for each one still in it
+        # (snapshots save the flags and put killed enemies back on restore)
+        self.roster = [entity
+                       for group in (items, enemies, elite_enemies, gates, [boss], [bench], skeletons,
+                                     flying_enemies, crystals, rolling_enemies, [skeleton_boss],
+                                     [npc], [treasure], [shopkeeper])
+                       for entity in group or () if entity is not None]
+        self.roster_index = {id(entity): i for i, entity in enumerate(self.roster)}
+        self.present = bytearray(len(self.roster))
+        for entity in self.roster:
+            self.add(entity)
+    
+    def set_present(self, present):
+        """Rebuild the stores so exactly the flagged roster entities are in the room"""
+        self.sync()  # The new engines start from the proxies
+        self.present[:] = bytes(len(self.roster))
+        self.entities.clear()
+        self.updaters.clear()
+        self.patrollers.clear()
+        self.bodies.clear()
+        self.flyers.clear()
+        self.colliders.clear()
+        self.projectiles.clear()
+        if self.patrol is not None:
+            self.patrol = PatrolEngine()
+        if self.flight is not None:
+            self.flight = FlightEngine(fixed_point=self.flight.fixed_point)
+        for entity, here in zip(self.roster, present):
+            if here:
+                self.add(entity)
+    
+    def add(self, entity):
+        index = self.roster_index.get(id(entity))
+        if index is not None:
+            self.present[index] = 1
+        self.entities.append(entity)
+        if isinstance(entity, Patroller):
+            self.patrollers.append(entity)
+            if self.patrol is not None:
+                self.patrol.add(entity)
+        elif isinstance(entity, Flyer):
+            self.flyers.append(entity)
+            if self.flight is not None:
+                self.flight.add(entity)
+        elif isinstance(entity, Body):
+            self.bodies.append(entity)
+        elif hasattr(entity, 'update'):
+            self.updaters.append(entity)
+        if hasattr(entity, 'hitbox'):
+            self.colliders.append(entity)
+        self.projectiles.extend(getattr(entity, 'pools', ()))
+    
+    def sync(self):
+        """Bring patrollers and flyers up to date after off-screen steps that didn't publish"""
+        if self.patrol is not None:
+            self.patrol.sync()
+        if self.flight is not None:
+            self.flight.sync()
+    
+    def has(self, entity):
+        """Whether entity is still in the room (not killed or picked up)"""
+        index = self.roster_index.get(id(entity))
+        if index is not None:
+            return bool(self.present[index])
+        return entity in self.entities
+    
+    def remove(self, entity):
+        index = self.roster_index.get(id(entity))
+        if index is not None:
+            self.present[index] = 0
+        self.entities.remove(entity)
+        if isinstance(entity, Patroller):
+            self.patrollers.remove(entity)
+            if self.patrol is not None:
+                self.patrol.remove(entity)
+        elif isinstance(entity, Flyer):
+            self.flyers.remove(entity)
+            if self.flight is not None:
+                self.flight.remove(entity)
+        elif entity in self.bodies:
+            self.bodies.remove(entity)
+        elif entity in self.updaters:
+            self.updaters.remove(entity)
+        if entity in self.colliders:
+            self.colliders.remove(entity)
+        for pool in getattr(entity, 'pools', ()):
+            self.projectiles.remove(pool)
+
 class Item:
+    __slots__ = ('x', 'y', 'width', 'height', 'item_type', 'color', 'collected', 'glow', 'rect', 'hitbox')
+    state = StateLayout(('collected', '?'), ('glow', 'd'))
     def __init__(self, x, y, item_type, color):
         self.x = x
         self.y = y
@@ -384,13 +525,15 @@ class Item:
         self.color = color
         self.collected = False
         self.glow = 0
+        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.hitbox = Hitbox(self, self.rect, PICKUP, PLAYER)
         
     def update(self):
         self.glow = (self.glow + 0.1) % (2 * math.pi)
         
     def draw(self, screen):
         if not self.collected:
-            glow_offset = int(math.sin(self.glow) * 4)
+            glow_offset = int(motion.sin(self.glow) * 4)
             # Glowing aura
             for i in range(3):
                 alpha_color = (self.color[0] // (i+1), self.color[1] // (i+1), self.color[2] // (i+1))
@@ -410,8 +553,11 @@ class Item:
             pygame.draw.circle(screen, WHITE, 
                              (int(self.x + 15), int(self.y + 15 + glow_offset)), 3)
 
-class Enemy:
+class Enemy(Patroller):
+    name = "Black knight"
+    __slots__ = ('y', 'width', 'height', 'rect', 'hitbox')
     def __init__(self, x, y, move_range):
+        Patroller.__init__(self)
         self.x = x
         self.y = y
         self.start_x = x
@@ -422,19 +568,8 @@ class Enemy:
         self.direction = 1
         self.health = 2
         self.hit_flash = 0
-        
-    def update(self):
-        self.x += self.speed * self.direction
-        if abs(self.x - self.start_x) > self.move_range:
-            self.direction *= -1
-        
-        if self.hit_flash > 0:
-            self.hit_flash -= 1
-    
-    def take_damage(self):
-        self.health -= 1
-        self.hit_flash = 10
-        return self.health <= 0
+        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.hitbox = Hitbox(self, self.rect, ENEMY, PLAYER | PLAYER_ATTACK)
     
     def draw(self, screen):
         # Flash white when hit
@@ -485,25 +620,192 @@ class Enemy:
             pygame.draw.rect(screen, DARK_GRAY, (self.x - 5, self.y + 18, 10, 3))
             pygame.draw.rect(screen, BLACK, (self.x + 4, self.y + 17, 2, 5))
 
-class Shockwave:
-    def __init__(self, x, y, direction):
+class EliteKnight(Body):
+    """Bigger, badder black knight that can JUMP!"""
+    name = "Elite knight"
+    __slots__ = ('x', 'y', 'start_x', 'width', 'height', 'speed', 'move_range', 'direction', 'health',
+                 'max_health', 'hit_flash', 'jump_cooldown', 'jump_power', 'vel_x', 'vel_y', 'gravity',
+                 'on_ground', 'rect', 'hitbox', 'fixed_point', 'route', 'route_key', 'jobs')
+    state = StateLayout(('x', 'd'), ('y', 'd'), ('vel_y', 'd'), ('direction', 'i'), ('health', 'i'),
+                        ('hit_flash', 'i'), ('jump_cooldown', 'i'), ('on_ground', '?'))
+    def __init__(self, x, y, move_range):
         self.x = x
         self.y = y
-        self.direction = direction  # 1 for right, -1 for left
+        self.start_x = x
+        self.width = 40  # BIGGER!
+        self.height = 50
+        self.speed = 1.5
+        self.move_range = move_range
+        self.direction = 1
+        self.health = 5  # Takes 5 hits!
+        self.max_health = 5
+        self.hit_flash = 0
+        self.jump_cooldown = 0
+        self.jump_power = 14  # Enough to follow the knight up 130 px onto a ledge
+        self.vel_x = 0
+        self.vel_y = 0
+        self.gravity = 0.6
+        self.on_ground = True
+        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.hitbox = Hitbox(self, self.rect, ENEMY, PLAYER | PLAYER_ATTACK)
+        self.fixed_point = False
+        # Last nav plan, for (platform it's on, platform the knight is on)
+        self.route = None
+        self.route_key = None
+        self.jobs = None  # In free play, re-planning waits for spare time in the frame
+    
+    def update(self, platforms, targets):
+        """targets is where the knights are this frame, (x, platform) pairs
+        cached once by the World"""
+        target_x, target_platform = min(targets, key=lambda target: abs(target[0] - self.x))
+        
+        # Apply gravity, walk, land on platforms (same as the player)
+        self.vel_y += self.gravity
+        self.vel_x = self.speed * self.direction
+        self.move(platforms, self.vel_x)
+        
+        # Steer while standing on something: straight at the knight if they're
+        # on the same platform (or out of reach), along the nav graph if not
+        edge = None
+        here = platforms.standing_on(self.rect)
+        if here is not None:
+            edge = self.next_move(platforms, here, target_platform)
+            if edge is None:
+                aim = target_x
+            elif abs(edge.takeoff - self.x) > self.speed:
+                aim = edge.takeoff
+            else:
+                aim = edge.landing
+                if edge.kind == JUMP:
+                    self.vel_y = -self.jump_power
+            if aim > self.x:
+                self.direction = 1
+            else:
+                self.direction = -1
+        
+        # Jump attack!
+        if self.jump_cooldown > 0:
+            self.jump_cooldown -= 1
+        elif self.on_ground and edge is None and abs(target_x - self.x) < 200:
+            # Jump toward the knight!
+            self.vel_y = -10
+            self.jump_cooldown = 120  # 2 seconds between jumps
+        
+        if self.hit_flash > 0:
+            self.hit_flash -= 1
+        if self.fixed_point:
+            self.x, self.y, self.vel_y = snap(self.x), snap(self.y), snap(self.vel_y)
+        self.rect.x, self.rect.y = int(self.x), int(self.y)
+    
+    def next_move(self, platforms, here, target_platform):
+        """First edge of the way from platform here to the knight's, or None"""
+        if target_platform is None or here == target_platform:
+            return None
+        if self.route_key != (here, target_platform):
+            if self.jobs is None:
+                self.plan(platforms, here, target_platform)
+            else:
+                self.jobs.add('elite replan', self.plan, platforms, here, target_platform,
+                              priority=HIGH, key=('replan', id(self)))
+                # Until it's done, keep to the old route if it still starts here
+                if not self.route or self.route[0].source != here:
+                    return None
+        return self.route[0] if self.route else None
+    
+    def plan(self, platforms, here, target_platform):
+        graph = platforms.navigation(self.width, self.jump_power, self.gravity, self.speed)
+        self.route = graph.find_path(here, target_platform)
+        self.route_key = (here, target_platform)
+    
+    def take_damage(self):
+        self.health -= 1
+        self.hit_flash = 10
+        return self.health <= 0
+    
+    def draw(self, screen):
+        if self.hit_flash > 0 and (self.hit_flash // 2) % 2 == 0:
+            color = WHITE
+            visor_color = WHITE
+        else:
+            color = BLACK
+            visor_color = CRIMSON  # Darker red!
+        
+        # BIGGER body
+        pygame.draw.rect(screen, DARK_GRAY, (self.x + 7, self.y + 18, 26, 24))
+        pygame.draw.rect(screen, color, (self.x + 9, self.y + 20, 22, 20))
+        pygame.draw.line(screen, GRAY, (self.x + 20, self.y + 18), (self.x + 20, self.y + 42), 3)
+        
+        # BIGGER helmet
+        pygame.draw.ellipse(screen, color, (self.x + 10, self.y + 5, 20, 20))
+        pygame.draw.ellipse(screen, DARK_GRAY, (self.x + 12, self.y + 7, 16, 16))
+        
+        # BIGGER horns
+        pygame.draw.polygon(screen, DARK_GRAY, [
+            (self.x + 10, self.y + 8),
+            (self.x + 5, self.y),
+            (self.x + 13, self.y + 5)
+        ])
+        pygame.draw.polygon(screen, DARK_GRAY, [
+            (self.x + 30, self.y + 8),
+            (self.x + 35, self.y),
+            (self.x + 27, self.y + 5)
+        ])
+        
+        # Glowing visor
+        pygame.draw.rect(screen, visor_color, (self.x + 13, self.y + 13, 14, 5))
+        if self.hit_flash == 0:
+            pygame.draw.rect(screen, ORANGE, (self.x + 14, self.y + 14, 12, 3))
+        
+        # BIGGER legs
+        pygame.draw.rect(screen, color, (self.x + 10, self.y + 42, 8, 8))
+        pygame.draw.rect(screen, color, (self.x + 22, self.y + 42, 8, 8))
+        
+        # BIGGER sword
+        if self.direction > 0:
+            pygame.draw.rect(screen, DARK_GRAY, (self.x + 33, self.y + 25, 15, 4))
+            pygame.draw.rect(screen, BLACK, (self.x + 32, self.y + 23, 3, 8))
+        else:
+            pygame.draw.rect(screen, DARK_GRAY, (self.x - 8, self.y + 25, 15, 4))
+            pygame.draw.rect(screen, BLACK, (self.x + 5, self.y + 23, 3, 8))
+        
+        # Health bar above head
+        bar_width = 40
+        bar_height = 4
+        health_percent = self.health / self.max_health
+        pygame.draw.rect(screen, BLACK, (self.x, self.y - 8, bar_width, bar_height))
+        pygame.draw.rect(screen, RED, (self.x, self.y - 8, bar_width * health_percent, bar_height))
+        pygame.draw.rect(screen, WHITE, (self.x, self.y - 8, bar_width, bar_height), 1)
+
+class Shockwave:
+    name = "Shockwave"
+    __slots__ = ('x', 'y', 'direction', 'speed', 'width', 'height', 'lifetime', 'rect', 'hitbox', 'pool', 'pool_slot')
+    state = StateLayout(('x', 'd'), ('y', 'd'), ('direction', 'i'), ('lifetime', 'i'))
+    def __init__(self, x, y, direction):
         self.speed = 6
         self.width = 30
         self.height = 20
+        self.rect = pygame.Rect(x, y - self.height, self.width, self.height)
+        self.hitbox = Hitbox(self, self.rect, ENEMY_PROJECTILE, PLAYER)
+        self.pool, self.pool_slot = None, -1
+        self.reset(x, y, direction)
+    
+    def reset(self, x, y, direction):
+        self.x = x
+        self.y = y
+        self.direction = direction  # 1 for right, -1 for left
         self.lifetime = 120  # 2 seconds
+        self.rect.x, self.rect.y = int(x), int(y - self.height)
         
     def update(self):
         self.x += self.speed * self.direction
         self.lifetime -= 1
+        self.rect.x = int(self.x)
         
     def is_alive(self):
         return self.lifetime > 0 and 0 < self.x < SCREEN_WIDTH
     
     def get_rect(self):
-        return pygame.Rect(self.x, self.y - self.height, self.width, self.height)
+        return self.rect
     
     def draw(self, screen):
         # Animated shockwave effect
@@ -522,6 +824,9 @@ class Shockwave:
                               0, math.pi, 3)
 
 class Dragon:
+    name = "Dragon"
+    state = StateLayout(('x', 'd'), ('direction', 'i'), ('health', 'i'), ('fire_cooldown', 'i'),
+                        ('shockwave_cooldown', 'i'), ('wing_flap', 'd'), ('hit_flash', 'i'))
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -535,11 +840,15 @@ class Dragon:
         self.move_range = 150
         self.fire_cooldown = 0
         self.shockwave_cooldown = 0
-        self.fireballs = []
-        self.shockwaves = []
+        self.fireballs = ProjectilePool(Fireball)
+        self.shockwaves = ProjectilePool(Shockwave)
+        self.pools = (self.fireballs, self.shockwaves)
         self.wing_flap = 0
         self.hit_flash = 0
         self.ground_y = 550  # Ground level for shockwave
+        # Only the body can be hit, and touching it doesn't hurt
+        self.rect = pygame.Rect(x + 20, y + 20, 70, 50)
+        self.hitbox = Hitbox(self, self.rect, ENEMY, PLAYER_ATTACK)
         
     def update(self):
         # Wing animation
@@ -549,13 +858,14 @@ class Dragon:
         self.x += self.move_speed * self.direction
         if abs(self.x - self.start_x) > self.move_range:
             self.direction *= -1
+        self.rect.x = int(self.x + 20)
         
         # Fire cooldown
         if self.fire_cooldown > 0:
             self.fire_cooldown -= 1
         else:
             # Shoot fireball
-            self.fireballs.append(Fireball(self.x + 50, self.y + 40, self.direction))
+            self.fireballs.spawn(self.x + 50, self.y + 40, self.direction)
             self.fire_cooldown = 90
         
         # Shockwave cooldown
@@ -563,20 +873,13 @@ class Dragon:
             self.shockwave_cooldown -= 1
         else:
             # Create shockwaves in both directions!
-            self.shockwaves.append(Shockwave(self.x + 50, self.ground_y, 1))
-            self.shockwaves.append(Shockwave(self.x + 50, self.ground_y, -1))
+            self.shockwaves.spawn(self.x + 50, self.ground_y, 1)
+            self.shockwaves.spawn(self.x + 50, self.ground_y, -1)
             self.shockwave_cooldown = 150  # 2.5 seconds
         
         # Update projectiles
-        for fireball in self.fireballs[:]:
-            fireball.update()
-            if fireball.x < -20 or fireball.x > SCREEN_WIDTH + 20:
-                self.fireballs.remove(fireball)
-        
-        for shockwave in self.shockwaves[:]:
-            shockwave.update()
-            if not shockwave.is_alive():
-                self.shockwaves.remove(shockwave)
+        self.fireballs.update()
+        self.shockwaves.update()
         
         if self.hit_flash > 0:
             self.hit_flash -= 1
@@ -598,7 +901,7 @@ class Dragon:
             accent_color = RED
         
         # Wing flap offset
-        wing_offset = int(math.sin(self.wing_flap) * 15)
+        wing_offset = int(motion.sin(self.wing_flap) * 15)
         
         # Wings
         pygame.draw.polygon(screen, body_color, [
@@ -732,19 +1035,34 @@ class Dragon:
             shockwave.draw(screen)
 
 class Fireball:
+    name = "Dragon fire"
+    __slots__ = ('x', 'y', 'direction', 'speed', 'radius', 'trail', 'rect', 'hitbox', 'pool', 'pool_slot')
+    state = StateLayout(('x', 'd'), ('y', 'd'), ('direction', 'i'))
     def __init__(self, x, y, direction):
-        self.x = x
-        self.y = y
-        self.direction = direction
         self.speed = 6
         self.radius = 10
         self.trail = []
+        self.rect = pygame.Rect(x - self.radius, y - self.radius, self.radius * 2, self.radius * 2)
+        self.hitbox = Hitbox(self, self.rect, ENEMY_PROJECTILE, PLAYER)
+        self.pool, self.pool_slot = None, -1
+        self.reset(x, y, direction)
+    
+    def reset(self, x, y, direction):
+        self.x = x
+        self.y = y
+        self.direction = direction
+        self.trail.clear()
+        self.rect.x, self.rect.y = int(x - self.radius), int(y - self.radius)
         
     def update(self):
         self.trail.append((self.x, self.y))
         if len(self.trail) > 8:
             self.trail.pop(0)
         self.x += self.speed * self.direction
+        self.rect.x = int(self.x - self.radius)
+    
+    def is_alive(self):
+        return -20 <= self.x <= SCREEN_WIDTH + 20
         
     def draw(self, screen):
         # Draw trail
@@ -827,16 +1145,35 @@ class TreasureChest:
 
 class Shopkeeper:
     """Friendly merchant NPC"""
+    state = StateLayout(('sword_bought', '?'), ('heart_bought', '?'))
     def __init__(self, x, y):
         self.x = x
         self.y = y
         self.width = 35
         self.height = 45
+        self.rect = pygame.Rect(x, y, self.width, self.height)
         self.items_for_sale = {
             'better_sword': {'cost': 50, 'bought': False, 'name': 'Better Sword'},
             'heart_container': {'cost': 100, 'bought': False, 'name': 'Heart Container'}
         }
     
+    # Flat views of the shop stock for snapshots
+    @property
+    def sword_bought(self):
+        return self.items_for_sale['better_sword']['bought']
+    
+    @sword_bought.setter
+    def sword_bought(self, bought):
+        self.items_for_sale['better_sword']['bought'] = bought
+    
+    @property
+    def heart_bought(self):
+        return self.items_for_sale['heart_container']['bought']
+    
+    @heart_bought.setter
+    def heart_bought(self, bought):
+        self.items_for_sale['heart_container']['bought'] = bought
+    
     def draw(self, screen):
         # Merchant body (fancy outfit!)
         pygame.draw.ellipse(screen, PURPLE, (self.x+5, self.y+18, 25, 27))
@@ -859,21 +1196,18 @@ class Shopkeeper:
         pygame.draw.line(screen, BROWN, (self.x+28, self.y+25), (self.x+28, self.y+28), 2)
 
 
-class Skeleton:
+class Skeleton(Patroller):
     """Spooky skeleton enemy"""
+    name = "Skeleton"
+    __slots__ = ('y', 'width', 'height', 'rect', 'hitbox')
     def __init__(self, x, y, move_range):
+        Patroller.__init__(self)
         self.x, self.y, self.start_x = x, y, x
         self.width, self.height = 25, 40
         self.speed, self.move_range, self.direction = 2.5, move_range, 1
         self.health, self.hit_flash = 3, 0
-    def update(self):
-        self.x += self.speed * self.direction
-        if abs(self.x - self.start_x) > self.move_range: self.direction *= -1
-        if self.hit_flash > 0: self.hit_flash -= 1
-    def take_damage(self):
-        self.health -= 1
-        self.hit_flash = 10
-        return self.health <= 0
+        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.hitbox = Hitbox(self, self.rect, ENEMY, PLAYER | PLAYER_ATTACK)
     def draw(self, screen):
         c = WHITE if (self.hit_flash>0 and (self.hit_flash//2)%2==0) else (240,240,230)
         pygame.draw.circle(screen, c, (int(self.x+12), int(self.y+10)), 10)
@@ -891,16 +1225,32 @@ class Skeleton:
         pygame.draw.line(screen, c, (self.x+14,self.y+35), (self.x+16,self.y+40), 3)
 
 class BoneProjectile:
+    name = "Bone"
+    __slots__ = ('x', 'y', 'direction', 'speed', 'rect', 'hitbox', 'pool', 'pool_slot')
+    state = StateLayout(('x', 'd'), ('y', 'd'), ('direction', 'i'))
     def __init__(self, x, y, direction):
-        self.x, self.y, self.direction, self.speed = x, y, direction, 5
+        self.speed = 5
+        self.rect = pygame.Rect(x - 7, y - 3, 14, 6)
+        self.hitbox = Hitbox(self, self.rect, ENEMY_PROJECTILE, PLAYER)
+        self.pool, self.pool_slot = None, -1
+        self.reset(x, y, direction)
+    def reset(self, x, y, direction):
+        self.x, self.y, self.direction = x, y, direction
+        self.rect.x, self.rect.y = int(x - 7), int(y - 3)
     def update(self):
         self.x += self.speed * self.direction
+        self.rect.x = int(self.x - 7)
+    def is_alive(self):
+        return -20 <= self.x <= 820
     def draw(self, screen):
         pygame.draw.rect(screen, (240,240,230), (self.x-4, self.y-2, 8, 4))
         pygame.draw.circle(screen, (240,240,230), (int(self.x-4), int(self.y)), 3)
         pygame.draw.circle(screen, (240,240,230), (int(self.x+4), int(self.y)), 3)
 
 class SkeletonBoss:
+    name = "Skeleton boss"
+    state = StateLayout(('x', 'd'), ('direction', 'i'), ('health', 'i'), ('attack_cooldown', 'i'),
+                        ('hit_flash', 'i'))
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -913,22 +1263,23 @@ class SkeletonBoss:
         self.start_x = x
         self.move_range = 200
         self.attack_cooldown = 0
-        self.bones = []
+        self.bones = ProjectilePool(BoneProjectile)
+        self.pools = (self.bones,)
         self.hit_flash = 0
+        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.hitbox = Hitbox(self, self.rect, ENEMY, PLAYER_ATTACK)
     
     def update(self):
         self.x += self.move_speed * self.direction
         if abs(self.x - self.start_x) > self.move_range:
             self.direction *= -1
+        self.rect.x = int(self.x)
         if self.attack_cooldown > 0:
             self.attack_cooldown -= 1
         else:
-            self.bones.append(BoneProjectile(self.x+30, self.y+30, self.direction))
+            self.bones.spawn(self.x+30, self.y+30, self.direction)
             self.attack_cooldown = 60
-        for bone in self.bones[:]:
-            bone.update()
-            if bone.x < -20 or bone.x > 820:
-                self.bones.remove(bone)
+        self.bones.update()
         if self.hit_flash > 0:
             self.hit_flash -= 1
     
@@ -965,39 +1316,28 @@ class SkeletonBoss:
             bone.draw(screen)
 
 
-class FlyingEnemy:
+class FlyingEnemy(Flyer):
     """Flying enemy like vengefly!"""
+    name = "Vengefly"
+    __slots__ = ('width', 'height', 'rect', 'hitbox')
+    state = StateLayout(('x', 'd'), ('y', 'd'), ('base_x', 'd'), ('angle', 'd'), ('direction', 'i'),
+                        ('health', 'i'), ('hit_flash', 'i'))
     def __init__(self, x, y, move_pattern="circle"):
+        Flyer.__init__(self)
         self.x, self.y = x, y
         self.start_x, self.start_y = x, y
+        self.base_x = x
         self.width, self.height = 25, 20
         self.speed, self.health, self.hit_flash = 2, 2, 0
-        self.move_pattern, self.angle, self.direction = move_pattern, 0, 1
-    
-    def update(self):
-        if self.move_pattern == "circle":
-            self.angle += 0.05
-            self.x = self.start_x + math.cos(self.angle) * 80
-            self.y = self.start_y + math.sin(self.angle) * 60
-        elif self.move_pattern == "hover":
-            self.angle += 0.08
-            self.y = self.start_y + math.sin(self.angle) * 40
-            self.x += self.speed * self.direction
-            if abs(self.x - self.start_x) > 100:
-                self.direction *= -1
-        if self.hit_flash > 0:
-            self.hit_flash -= 1
-    
-    def take_damage(self):
-        self.health -= 1
-        self.hit_flash = 10
-        return self.health <= 0
+        self.pattern, self.angle, self.direction = PATTERNS[move_pattern], 0, 1
+        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.hitbox = Hitbox(self, self.rect, ENEMY, PLAYER | PLAYER_ATTACK)
     
     def draw(self, screen):
         c = WHITE if (self.hit_flash>0 and (self.hit_flash//2)%2==0) else ORANGE
         pygame.draw.ellipse(screen, c, (int(self.x+5), int(self.y+5), 15, 10))
         pygame.draw.ellipse(screen, DARK_GOLD, (int(self.x+7), int(self.y+7), 11, 6))
-        wo = int(abs(math.sin(self.angle * 10)) * 3)
+        wo = int(abs(motion.sin(self.angle * 10)) * 3)
         pygame.draw.ellipse(screen, (200,255,255), (int(self.x-5), int(self.y+3+wo), 12, 8))
         pygame.draw.ellipse(screen, (200,255,255), (int(self.x+18), int(self.y+3+wo), 12, 8))
         pygame.draw.circle(screen, RED, (int(self.x+10), int(self.y+9)), 2)
@@ -1005,30 +1345,23 @@ class FlyingEnemy:
         pygame.draw.polygon(screen, BLACK, [(int(self.x+12),int(self.y+15)),(int(self.x+10),int(self.y+18)),(int(self.x+14),int(self.y+18))])
 
 
-class RollingEnemy:
+class RollingEnemy(Patroller):
     """Rock enemy that curls and rolls like baldur!"""
+    name = "Rolling rock"
+    __slots__ = ('y', 'width', 'height', 'rolling', 'rect', 'hitbox')
     def __init__(self, x, y):
+        Patroller.__init__(self)
         self.x, self.y = x, y
         self.start_x = x
         self.width, self.height = 30, 30
         self.speed = 4
+        self.move_range = 150  # Rolls back and forth
         self.direction = 1
         self.health = 1  # One hit!
         self.rolling = True
         self.hit_flash = 0
-    
-    def update(self):
-        # Roll back and forth
-        self.x += self.speed * self.direction
-        if abs(self.x - self.start_x) > 150:
-            self.direction *= -1
-        if self.hit_flash > 0:
-            self.hit_flash -= 1
-    
-    def take_damage(self):
-        self.health -= 1
-        self.hit_flash = 10
-        return self.health <= 0
+        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.hitbox = Hitbox(self, self.rect, ENEMY, PLAYER | PLAYER_ATTACK)
     
     def draw(self, screen):
         c = WHITE if (self.hit_flash>0 and (self.hit_flash//2)%2==0) else GRAY
@@ -1037,13 +1370,15 @@ class RollingEnemy:
         pygame.draw.circle(screen, DARK_GRAY, (int(self.x+15), int(self.y+15)), 12)
         # Segments (armored shell)
         for i in range(4):
-            angle = (self.x / 10 + i * 1.57) % 6.28
-            seg_x = int(self.x + 15 + math.cos(angle) * 8)
-            seg_y = int(self.y + 15 + math.sin(angle) * 8)
+            angle = self.x / 10 + i * math.pi / 2
+            seg_x = int(self.x + 15 + motion.cos(angle) * 8)
+            seg_y = int(self.y + 15 + motion.sin(angle) * 8)
             pygame.draw.circle(screen, c, (seg_x, seg_y), 4)
 
 class Crystal:
     """Decorative crystal"""
+    __slots__ = ('x', 'y', 'color', 'glow')
+    state = StateLayout(('glow', 'd'))
     def __init__(self, x, y, color):
         self.x, self.y, self.color = x, y, color
         self.glow = 0
@@ -1052,7 +1387,7 @@ class Crystal:
         self.glow = (self.glow + 0.05) % (2 * math.pi)
     
     def draw(self, screen):
-        brightness = int(abs(math.sin(self.glow)) * 50)
+        brightness = int(abs(motion.sin(self.glow)) * 50)
         glow_color = tuple(min(255, c + brightness) for c in self.color)
         # Crystal shape
         pygame.draw.polygon(screen, glow_color, [
@@ -1069,6 +1404,10 @@ class Crystal:
         ])
 
 
+# Built, but no door leads there (the dash comes from beating the dragon)
+UNREACHABLE_ROOMS = {'dash_room'}
+
+
 def create_rooms():
     """Create the game world"""
     rooms = {}
@@ -1111,6 +1450,34 @@ def create_rooms():
         ],
     )
     
+    # Elite Guard 1
+    rooms['elite1'] = Room(
+        'elite1',
+        platforms=[
+            pygame.Rect(0, 550, 800, 50),
+            pygame.Rect(150, 450, 120, 20),
+            pygame.Rect(400, 380, 120, 20),
+            pygame.Rect(650, 450, 120, 20),
+        ],
+        elite_enemies=[
+            EliteKnight(300, 500, 150),
+        ]
+    )
+    
+    # Elite Guard 2
+    rooms['elite2'] = Room(
+        'elite2',
+        platforms=[
+            pygame.Rect(0, 550, 800, 50),
+            pygame.Rect(200, 420, 100, 20),
+            pygame.Rect(500, 420, 100, 20),
+        ],
+        elite_enemies=[
+            EliteKnight(250, 500, 100),
+            EliteKnight(550, 500, 100),
+        ]
+    )
+    
     rooms['dragon'] = Room(
         'dragon',
         platforms=[
@@ -1273,339 +1640,524 @@ def draw_heart(screen, x, y, filled):
     ])
     pygame.draw.circle(screen, inner_color, (x + 1, y), 2)
 
-def main():
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("Knight's Adventure 🧭⚔️🐉")
-    clock = pygame.time.Clock()
+class RoomScheduler:
+    """Keeps the rooms the knight isn't in ticking, just less often.
     
-    player = Player(100, 300)
-    rooms = create_rooms()
-    current_room = 'start'
+    The current room runs every frame. Every other room gets a tick every
+    `interval` frames, spread out so only a room or two tick on any frame.
+    A tick catches the room's patrollers up on every frame they missed (the
+    patrol engine does that in one go) and gives everything else one update.
+    Walking into a room catches it up first, then it runs at full rate.
     
-    message = "LEFT/RIGHT = Move | UP = Jump | X = Sword Attack!"
-    message_timer = 240
-    dragon_defeated = False
-    game_over = False
+    This runs on the main thread on purpose: the rooms are plain Python, so a
+    worker thread wouldn't run them any faster, and it would make the frame
+    order depend on thread timing.
     
-    running = True
-    while running:
-        clock.tick(FPS)
+    With jobs (a JobScheduler, free play only) an off-screen tick is queued
+    instead and runs in the frame's spare time, catching up however many
+    frames it's been by then.
+    """
+    def __init__(self, rooms, current, interval=10, jobs=None):
+        self.rooms = rooms
+        self.current = current
+        self.interval = interval
+        self.jobs = jobs
+        self.frame = 0
+        self.last_tick = {name: 0 for name in rooms}
+        # Give each room a fixed offset so their ticks don't all land together
+        self.offsets = {name: i % interval for i, name in enumerate(rooms)}
+    
+    def tick(self, current, move):
+        """Run once per frame, before the current room moves. move(room, frames) moves a room"""
+        self.frame += 1
+        if current != self.current:
+            # Catch up to last frame; this frame it runs with everything else
+            self.catch_up(current, move, self.frame - 1)
+            self.current = current
+        self.last_tick[current] = self.frame
+        for name in self.rooms:
+            if name != current and (self.frame + self.offsets[name]) % self.interval == 0:
+                if self.jobs is None:
+                    self.catch_up(name, move, self.frame)
+                else:
+                    self.jobs.add('room tick', self.catch_up_off_screen, name, move,
+                                  priority=LOW, key=('room tick', name))
+    
+    def catch_up(self, name, move, upto):
+        missed = upto - self.last_tick[name]
+        if missed > 0:
+            move(self.rooms[name], missed)
+        self.last_tick[name] = upto
+    
+    def catch_up_off_screen(self, name, move):
+        if name != self.current:
+            self.catch_up(name, move, self.frame)
+
+
+class World:
+    """The whole game: the knight, every room, and the systems that run them.
+    
+    With a seed the world is deterministic: the same inputs give the same
+    state_hash() every run. fixed_point also snaps physics to 1/256 px so the
+    hashes match across machines too. coop adds a second knight, the partner,
+    who follows the first one through doors (see netplay.py).
+    
+    Things that happen go out as events on self.events (see events.py); the
+    HUD message, audio, telemetry and achievements all listen there.
+    
+    Work that can wait goes on self.jobs (see scheduler.py), which the main
+    loop runs in each frame's spare time. Only an unseeded world puts
+    gameplay work there, since when it runs depends on the clock.
+    """
+    def __init__(self, seed=None, fixed_point=False, coop=False):
+        self.seed = seed
+        self.fixed_point = fixed_point
+        self.coop = coop
+        self.collisions = CollisionWorld()
+        self.collisions.on(PLAYER_ATTACK, ENEMY, self.player_hits_enemy)
+        self.collisions.on(PLAYER, ENEMY, self.enemy_hits_player)
+        self.collisions.on(PLAYER, ENEMY_PROJECTILE, self.projectile_hits_player)
+        self.collisions.on(PLAYER, PICKUP, self.player_picks_up)
+        self.events = EventBus()
+        self.hud = Hud(self.events)
+        self.audio = Audio(self.events)
+        self.telemetry = Telemetry(self.events)
+        self.events.on(RoomEntered, self.room_entered)
+        self.jobs = JobScheduler(1 / FPS)
+        self.autosave_path = None
+        self.profiler = Profiler()  # F3
+        self.restart()
+        self.achievements = Achievements(self.events, {name: room for name, room in self.rooms.items()
+                                                       if name not in UNREACHABLE_ROOMS})
+        self.events.emit(Notice("LEFT/RIGHT = Move | UP = Jump | X = Sword Attack!", 240))
+    
+    def restart(self):
+        # Gameplay randomness comes from rng only. Particles and other looks
+        # use fx_rng, so cosmetic changes can't change what happens.
+        self.rng = random.Random(self.seed)
+        self.fx_rng = random.Random(None if self.seed is None else f"{self.seed}:fx")
+        self.player = Player(100, 300)
+        self.players = [self.player]
+        if self.coop:
+            partner = Player(140, 300)
+            partner.crest = GOLD
+            self.players.append(partner)
+        for player in self.players:
+            player.fx_rng = self.fx_rng
+        self.rooms = create_rooms()
+        self.current_room = 'start'
+        self.jobs.clear()
+        gameplay_jobs = self.jobs if self.seed is None else None
+        self.scheduler = RoomScheduler(self.rooms, self.current_room, jobs=gameplay_jobs)
+        for name, room in self.rooms.items():
+            for body in room.bodies:
+                if isinstance(body, EliteKnight):
+                    body.jobs = gameplay_jobs
+                    # Have the nav graph ready before anyone walks in
+                    self.jobs.add('nav graph', room.platform_index.navigation, body.width,
+                                  body.jump_power, body.gravity, body.speed,
+                                  priority=LOW, key=('nav graph', name))
+        self.targets = tuple((player.x, None) for player in self.players)
+        if self.fixed_point:
+            for player in self.players:
+                player.fixed_point = True
+            for room in self.rooms.values():
+                for entity in room.entities:
+                    if hasattr(entity, 'fixed_point'):
+                        entity.fixed_point = True
+                if room.flight is not None:
+                    room.flight.fixed_point = True
+        self.events.emit(Notice("LEFT/RIGHT = Move | UP = Jump | X = Attack!", 240))
+        self.dragon_defeated = False
+        self.game_over = False
+        # Rewind is single player: rollback re-runs frames, which would fill
+        # each peer's buffer differently
+        self.rewind = None if self.coop else RewindBuffer()
+        self.rewinding = False
+    
+    @property
+    def room(self):
+        return self.rooms[self.current_room]
+    
+    def state_hash(self, rooms=None):
+        """Hash of the gameplay state, for checking two runs stayed in sync.
+        With rooms (names), only the knights and those rooms"""
+        digest = hashlib.blake2b(digest_size=16)
+        for player in self.players:
+            digest.update(struct.pack('<4d5i', player.x, player.y, player.vel_x, player.vel_y,
+                                      player.health, player.max_health, player.coins,
+                                      player.invincible_timer, player.attack_timer))
+        digest.update(self.current_room.encode())
+        for name in self.rooms if rooms is None else rooms:
+            room = self.rooms[name]
+            room.sync()
+            digest.update(name.encode())
+            for entity in room.entities:
+                digest.update(struct.pack('<2di', entity.x, entity.y, getattr(entity, 'health', 0)))
+            for pool in room.projectiles:
+                for projectile in pool:
+                    digest.update(struct.pack('<2d', projectile.x, projectile.y))
+        return digest.hexdigest()
+    
+    def snapshot(self, rooms=None):
+        """The whole gameplay state as bytes, or only some rooms' (see snapshot.py)"""
+        return save_world(self, rooms)
+    
+    def restore(self, data):
+        """Go back to a snapshot() of this world"""
+        restore_world(self, data)
+    
+    def step(self, inputs, partner_inputs=0):
+        """Advance one frame. inputs is that frame's input bits (see replay.py),
+        partner_inputs the second knight's in a co-op world"""
+        # Holding Z in a rewind room runs time backwards instead (even after dying)
+        self.rewinding = (self.rewind is not None and bool(inputs & IN_REWIND)
+                          and self.current_room in REWIND_ROOMS)
+        profiler = self.profiler
+        if self.rewinding:
+            snapshot = self.rewind.pop()
+            if snapshot:
+                self.restore(snapshot)
+            profiler.lap(REWIND)
+            return
+        if self.rewind is not None:
+            if self.current_room in REWIND_ROOMS:
+                # Only this room rewinds; the rest of the world keeps going
+                self.rewind.push(self.snapshot((self.current_room,)))
+            elif len(self.rewind):
+                self.rewind.clear()
+        profiler.lap(REWIND)
+        
+        controls = list(zip(self.players, (inputs, partner_inputs)))
+        # Key presses first, like the KEYDOWN events they came from
+        for player, bits in controls:
+            if bits & IN_UP:
+                player.jump()
+            if bits & IN_X:
+                player.attack()
+            if bits & IN_D:
+                player.dash()
+        if (inputs | partner_inputs) & IN_R and self.game_over:
+            self.restart()
+            controls = list(zip(self.players, (inputs, partner_inputs)))
+        
+        self.hud.tick()
+        profiler.lap(INPUT)
+        if self.game_over:
+            return
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP:
-                    player.jump()
-                elif event.key == pygame.K_x:
-                    player.attack()
-                elif event.key == pygame.K_d:
-                    player.dash()
-                elif event.key == pygame.K_ESCAPE:
-                    running = False
-                elif event.key == pygame.K_r and game_over:
-                    player = Player(100, 300)
-                    current_room = 'start'
-                    rooms = create_rooms()
-                    game_over = False
-                    dragon_defeated = False
-                    message = "LEFT/RIGHT = Move | UP = Jump | X = Attack!"
-                    message_timer = 240
-        
-        if not game_over:
-            keys = pygame.key.get_pressed()
+        room = self.room
+        for player, bits in controls:
             player.vel_x = 0
-            if keys[pygame.K_LEFT]:
+            if bits & IN_LEFT:
                 player.vel_x = -player.speed
-            if keys[pygame.K_RIGHT]:
+            if bits & IN_RIGHT:
                 player.vel_x = player.speed
             
-            room = rooms[current_room]
-            player.update(room.platforms)
+            player.update(room.platform_index)
             # Obby fall check
-            if current_room == 'obby' and player.y > 560:
+            if self.current_room == 'obby' and player.y > 560:
                 player.x, player.y, player.vel_y = 50, 500, 0
-                message, message_timer = "Fell! Try again!", 60
-
+                self.events.emit(Notice("Fell! Try again!", 60))
             
             if not player.is_alive():
-                game_over = True
-                message = "You have fallen! Press R to restart"
-                message_timer = 9999
-            
-            for item in room.items:
-                item.update()
-            # Update crystals
-            for crystal in room.crystals:
-                crystal.update()
-
-            
-
-            # Shop interaction
-            if room.shopkeeper and keys[pygame.K_x]:
-                player_rect = pygame.Rect(player.x, player.y, player.width, player.height)
-                shop_rect = pygame.Rect(room.shopkeeper.x, room.shopkeeper.y, room.shopkeeper.width, room.shopkeeper.height)
-                if player_rect.colliderect(shop_rect):
-                    # Try to buy items
-                    if not room.shopkeeper.items_for_sale['better_sword']['bought']:
-                        cost = room.shopkeeper.items_for_sale['better_sword']['cost']
-                        if player.coins >= cost:
-                            player.coins -= cost
-                            player.sword_level = 2
-                            room.shopkeeper.items_for_sale['better_sword']['bought'] = True
-                            message = f"Bought Better Sword! (50 coins) Coins: {player.coins}"
-                            message_timer = 150
-                        else:
-                            message = f"Better Sword costs 50 coins. You have {player.coins}"
-                            message_timer = 120
-                    elif not room.shopkeeper.items_for_sale['heart_container']['bought']:
-                        cost = room.shopkeeper.items_for_sale['heart_container']['cost']
-                        if player.coins >= cost:
-                            player.coins -= cost
-                            player.max_health += 1
-                            player.health = player.max_health
-                            room.shopkeeper.items_for_sale['heart_container']['bought'] = True
-                            message = f"Bought Heart Container! (100 coins) Coins: {player.coins}"
-                            message_timer = 150
-                        else:
-                            message = f"Heart Container costs 100 coins. You have {player.coins}"
-                            message_timer = 120
-                    else:
-                        message = "Sold out! Thanks for shopping!"
-                        message_timer = 90
-
-            attack_rect = player.get_attack_rect()
-            for enemy in room.enemies[:]:
-                enemy.update()
-                
-                if attack_rect:
-                    enemy_rect = pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height)
-                    if attack_rect.colliderect(enemy_rect):
-                        if enemy.take_damage():
-                            room.enemies.remove(enemy)
-                            message = "Black knight defeated!"
-                            message_timer = 60
-                
-                enemy_rect = pygame.Rect(enemy.x, enemy.y, enemy.width, enemy.height)
-                player_rect = pygame.Rect(player.x, player.y, player.width, player.height)
-                if player_rect.colliderect(enemy_rect):
-                    if player.take_damage():
-                        message = f"Hit by black knight! Health: {player.health}/{player.max_health}"
-                        message_timer = 90
-            
-            if room.boss and room.boss.is_alive():
-                room.boss.update()
-                
-                player_rect = pygame.Rect(player.x, player.y, player.width, player.height)
-                
-                # Check fireballs
-                for fireball in room.boss.fireballs[:]:
-                    fireball_rect = pygame.Rect(fireball.x - fireball.radius, 
-                                               fireball.y - fireball.radius,
-                                               fireball.radius * 2, fireball.radius * 2)
-                    if player_rect.colliderect(fireball_rect):
-                        if player.take_damage():
-                            message = f"Dragon fire! Health: {player.health}/{player.max_health}"
-                            message_timer = 90
-                        room.boss.fireballs.remove(fireball)
-                
-                # Check shockwaves
-                for shockwave in room.boss.shockwaves:
-                    if player_rect.colliderect(shockwave.get_rect()):
-                        if not player.on_ground:  # You can jump over shockwaves!
-                            continue
-                        if player.take_damage():
-                            message = f"Shockwave! Jump to avoid! Health: {player.health}/{player.max_health}"
-                            message_timer = 90
-                
-                # Player attacks dragon
-                if attack_rect:
-                    boss_rect = pygame.Rect(room.boss.x + 20, room.boss.y + 20, 70, 50)
-                    if attack_rect.colliderect(boss_rect):
-                        for _ in range(player.sword_level):
-                            room.boss.take_damage()
-                        message = f"Dragon hit! Health: {room.boss.health}/{room.boss.max_health}"
-                        message_timer = 60
-                        
-                        if not room.boss.is_alive():
-                            dragon_defeated = True
-                            player.has_dash = True
-                            message = "🐉 DRAGON DEFEATED! Dash unlocked! Press D!"
-                            message_timer = 200
+                self.game_over = True
+                self.events.emit(Notice("You have fallen! Press R to restart", 9999))
             
-            player_rect = pygame.Rect(player.x, player.y, player.width, player.height)
-            for item in room.items:
-                if not item.collected:
-                    item_rect = pygame.Rect(item.x, item.y, item.width, item.height)
-                    if player_rect.colliderect(item_rect):
-                        item.collected = True
-                        if item.item_type == 'double_jump':
-                            player.has_double_jump = True
-                            message = "DOUBLE JUMP unlocked! Press UP twice!"
-                            message_timer = 180
-                        elif item.item_type == 'dash':
-                            player.has_dash = True
-                            message = "DASH UNLOCKED! Press D to dash!"
-                            message_timer = 180
-                        elif item.item_type == 'map':
-                            player.has_map = True
-                            message = "MAP ACQUIRED! Now you can see where you are!"
-                            message_timer = 180
-                        elif item.item_type == 'heart_upgrade':
-                            player.max_health += 1
-                            player.health = player.max_health
-                            message = "MAX HEALTH +1!"
-                            message_timer = 180
-            
-            # Room transitions
-            if current_room == 'start':
-                if player.x >= SCREEN_WIDTH - player.width - 5:
-                    current_room = 'item'
-                    player.x = 10
-                    message = "Treasure chamber..."
-                    message_timer = 90
-            elif current_room == 'item':
-                if player.x <= 5:
-                    current_room = 'start'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5:
-                    if player.has_double_jump:
-                        current_room = 'knights'
-                        player.x = 10
-                        message = "Black knights ahead! Use X to attack!"
-                        message_timer = 120
-                    else:
-                        player.x = SCREEN_WIDTH - player.width - 10
-                        message = "You need a special ability to pass..."
-                        message_timer = 120
-            elif current_room == 'knights':
-                if player.x <= 5:
-                    current_room = 'item'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5:
-                    current_room = 'dragon'
-                    player.x = 10
-                    message = "THE DRAGON! Attack with X! Jump over shockwaves!"
-                    message_timer = 180
-            elif current_room == 'dragon':
-                if player.x <= 5 and not dragon_defeated:
-                    current_room = 'knights'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5 and dragon_defeated:
-                    current_room = 'obby'
-                    player.x, player.y = 50, 500
-                    message, message_timer = "You defeated the dragon! PARKOUR TIME!", 180
-            elif current_room == 'obby':
-                # Obby fall reset is handled earlier
-                if player.x >= 750 and player.y < 350:
-                    current_room = 'cartographer'
-                    player.x = 10
-                    message, message_timer = "Cartographer's Room!", 120
-                elif player.x >= SCREEN_WIDTH - player.width - 5 and player.y < 200:
-                    current_room = 'skeletons'
-                    player.x = 10
-                    message, message_timer = "SKELETONS! 💀", 120
-                elif player.x <= 5:
-                    current_room = 'dragon'
-                    player.x = SCREEN_WIDTH - player.width - 10
-            elif current_room == 'cartographer':
-                if player.x <= 5:
-                    current_room = 'obby'
-                    player.x = 740
-                    player.y = 280
-            elif current_room == 'skeletons':
-                if player.x <= 5:
-                    current_room = 'obby'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5:
-                    current_room = 'skeleton_boss'
-                    player.x = 10
-                    message, message_timer = "SKELETON BOSS!", 150
-            elif current_room == 'skeleton_boss':
-                if player.x <= 5:
-                    current_room = 'skeletons'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5:
-                    current_room = 'treasure'
-                    player.x = 10
-                    message, message_timer = "Treasure!", 120
-            elif current_room == 'treasure':
-                if player.x <= 5:
-                    current_room = 'skeleton_boss'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5:
-                    current_room = 'shop'
-                    player.x = 10
-                    message, message_timer = "Shop! Press X near merchant!", 150
-            elif current_room == 'shop':
-                if player.x <= 5:
-                    current_room = 'treasure'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5:
-                    current_room = 'cliffs'
-                    player.x = 10
-                    message, message_timer = "THE CLIFFS! Flying enemies!", 150
-            elif current_room == 'cliffs':
-                if player.x <= 5:
-                    current_room = 'shop'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5 and player.y < 200:
-                    current_room = 'crystal_plains'
-                    player.x = 10
-                    message, message_timer = "Crystal Plains!", 120
-            elif current_room == 'crystal_plains':
-                if player.x <= 5:
-                    current_room = 'cliffs'
-                    player.x = SCREEN_WIDTH - player.width - 10
-                elif player.x >= SCREEN_WIDTH - player.width - 5:
-                    message, message_timer = "🎉 YOU WIN! Game complete! 🎉", 9999
-        
-        # Draw
-        screen.fill(WHITE)
-        
+            if room.shopkeeper and bits & IN_X_HELD:
+                self.shop(player, room.shopkeeper)
+        
+        # Where the knights are, cached once for everything that chases them
+        self.targets = tuple((player.x, room.platform_index.standing_on(player.rect))
+                             for player in self.players)
+        profiler.lap(PHYSICS)
+        self.scheduler.tick(self.current_room, self.move_system)
+        profiler.lap(OFF_SCREEN)
+        self.enemy_system(room)
+        profiler.lap(ENEMIES)
+        self.update_system(room)
+        profiler.lap(BOSSES)
+        self.collision_system(room)
+        profiler.lap(COLLISIONS)
+        self.transition()
+        profiler.lap(TRANSITIONS)
+        # The partner follows the first knight through doors
+        if room is not self.room:
+            for partner in self.players[1:]:
+                partner.x, partner.y, partner.vel_y = self.player.x, self.player.y, 0
+    
+    def room_entered(self, event):
+        if self.autosave_path:
+            self.jobs.add('autosave', self.autosave, priority=LOW, key='autosave')
+    
+    def autosave(self):
+        partial = self.autosave_path + '.tmp'
+        with open(partial, 'wb') as f:
+            f.write(self.snapshot())
+        os.replace(partial, self.autosave_path)
+    
+    def shop(self, player, shopkeeper):
+        if player.rect.colliderect(shopkeeper.rect):
+            # Try to buy items
+            if not shopkeeper.items_for_sale['better_sword']['bought']:
+                cost = shopkeeper.items_for_sale['better_sword']['cost']
+                if player.coins >= cost:
+                    player.coins -= cost
+                    player.sword_level = 2
+                    shopkeeper.items_for_sale['better_sword']['bought'] = True
+                    self.events.emit(Purchase("Better Sword", cost, player.coins, True))
+                else:
+                    self.events.emit(Purchase("Better Sword", cost, player.coins, False))
+            elif not shopkeeper.items_for_sale['heart_container']['bought']:
+                cost = shopkeeper.items_for_sale['heart_container']['cost']
+                if player.coins >= cost:
+                    player.coins -= cost
+                    player.max_health += 1
+                    player.health = player.max_health
+                    shopkeeper.items_for_sale['heart_container']['bought'] = True
+                    self.events.emit(Purchase("Heart Container", cost, player.coins, True))
+                else:
+                    self.events.emit(Purchase("Heart Container", cost, player.coins, False))
+            else:
+                self.events.emit(Notice("Sold out! Thanks for shopping!", 90))
+    
+    # Systems: each one walks a component store, whatever kind of thing is in it
+    
+    def move_system(self, room, frames=1):
+        """Movement and AI for everything in the room.
+        
+        With frames > 1 (rooms catching up off-screen) patrollers and flyers
+        get every missed frame and everything else gets a single update.
+        """
+        self.enemy_system(room, frames)
+        self.update_system(room)
+    
+    def enemy_system(self, room, frames=1):
+        """The rank and file: patrollers, flyers and bodies"""
+        # Off-screen engines skip copying onto their proxies until a Room.sync()
+        publish = room is self.room
+        if room.patrol is not None:
+            room.patrol.step(frames, publish)
+        else:
+            for _ in range(frames):
+                for patroller in room.patrollers:
+                    patroller.update()
+        if room.flight is not None:
+            room.flight.step(frames, publish)
+        else:
+            for _ in range(frames):
+                for flyer in room.flyers:
+                    flyer.update()
+        if room.bodies:
+            targets = self.targets
+            if room is not self.room:
+                # The knights aren't standing on this room's platforms
+                targets = tuple((x, None) for x, _ in targets)
+            for body in room.bodies:
+                body.update(room.platform_index, targets)
+    
+    def update_system(self, room):
+        """Everything with its own update(): the bosses, spawners and the like"""
+        for entity in room.updaters:
+            entity.update()
+    
+    def collision_system(self, room):
+        """Register this frame's hitboxes and let the damage handlers sort it out"""
+        collisions = self.collisions
+        collisions.clear()
+        for player in self.players:
+            collisions.add(player.hitbox)
+            if player.get_attack_rect():
+                collisions.add(player.attack_hitbox)
+        for entity in room.colliders:
+            collisions.add(entity.hitbox)
+        for pool in room.projectiles:
+            for projectile in pool:
+                collisions.add(projectile.hitbox)
+        collisions.dispatch()
+    
+    def render_system(self, room, screen):
+        room.sync()
         for platform in room.platforms:
             pygame.draw.rect(screen, BROWN, platform)
             pygame.draw.rect(screen, DARK_BROWN, (platform.x, platform.y, platform.width, 5))
             pygame.draw.rect(screen, GRAY, platform, 2)
         
-        for item in room.items:
-            item.draw(screen)
-        
-        for enemy in room.enemies:
-            enemy.draw(screen)
-        
-        if room.boss:
-            room.boss.draw(screen)
-        for skeleton in room.skeletons:
-            skeleton.draw(screen)
-        
-        for flyer in room.flying_enemies:
-            flyer.draw(screen)
-        
-        for crystal in room.crystals:
-            crystal.draw(screen)
-        
-        for roller in room.rolling_enemies:
-            roller.draw(screen)
-        
-        if room.skeleton_boss:
-            room.skeleton_boss.draw(screen)
-        
-        if room.npc:
-            room.npc.draw(screen)
-        
-        if room.treasure:
-            room.treasure.draw(screen)
-        
-        if room.shopkeeper:
-            room.shopkeeper.draw(screen)
-
-        
-        player.draw(screen)
+        for entity in room.entities:
+            entity.draw(screen)
+    
+    # Damage handlers (called by the collision system)
+    
+    def player_hits_enemy(self, player, enemy):
+        room = self.room
+        if not room.has(enemy):
+            return  # The other knight got it first this frame
+        if isinstance(enemy, (Dragon, SkeletonBoss)):
+            for _ in range(player.sword_level):
+                enemy.take_damage()
+            self.events.emit(EnemyHit(enemy.name, enemy.health, enemy.max_health, boss=True))
+            
+            if not enemy.is_alive():
+                room.remove(enemy)
+                if isinstance(enemy, Dragon):
+                    self.dragon_defeated = True
+                    player.has_dash = True
+                self.events.emit(BossDefeated(enemy.name))
+        elif enemy.take_damage():
+            room.remove(enemy)
+            self.events.emit(EnemyKilled(enemy.name))
+        elif isinstance(enemy, EliteKnight):
+            self.events.emit(EnemyHit(enemy.name, enemy.health, enemy.max_health))
+    
+    def enemy_hits_player(self, player, enemy):
+        if player.take_damage():
+            self.events.emit(PlayerHit(enemy.name, player.health, player.max_health))
+    
+    def projectile_hits_player(self, player, projectile):
+        if isinstance(projectile, Shockwave):
+            if not player.on_ground:  # You can jump over shockwaves!
+                return
+            if player.take_damage():
+                self.events.emit(PlayerHit(projectile.name, player.health, player.max_health, True))
+        else:
+            if player.take_damage():
+                self.events.emit(PlayerHit(projectile.name, player.health, player.max_health, True))
+            projectile.pool.kill(projectile)
+    
+    def player_picks_up(self, player, item):
+        if not self.room.has(item):
+            return  # Both knights touched it on the same frame
+        item.collected = True
+        self.room.remove(item)
+        if item.item_type == 'double_jump':
+            player.has_double_jump = True
+        elif item.item_type == 'dash':
+            player.has_dash = True
+        elif item.item_type == 'map':
+            player.has_map = True
+        elif item.item_type == 'heart_upgrade':
+            player.max_health += 1
+            player.health = player.max_health
+        self.events.emit(ItemCollected(item.item_type))
+    
+    def transition(self):
+        player = self.player
+        came_from = self.current_room
+        # Room transitions
+        if self.current_room == 'start':
+            if player.x >= SCREEN_WIDTH - player.width - 5:
+                self.current_room = 'item'
+                player.x = 10
+        elif self.current_room == 'item':
+            if player.x <= 5:
+                self.current_room = 'start'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                if player.has_double_jump:
+                    self.current_room = 'knights'
+                    player.x = 10
+                else:
+                    player.x = SCREEN_WIDTH - player.width - 10
+                    self.events.emit(Notice("You need a special ability to pass...", 120))
+        elif self.current_room == 'knights':
+            if player.x <= 5:
+                self.current_room = 'item'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                self.current_room = 'elite1'
+                player.x = 10
+        elif self.current_room == 'elite1':
+            if player.x <= 5:
+                self.current_room = 'knights'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                self.current_room = 'elite2'
+                player.x = 10
+        elif self.current_room == 'elite2':
+            if player.x <= 5:
+                self.current_room = 'elite1'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                self.current_room = 'dragon'
+                player.x = 10
+        elif self.current_room == 'dragon':
+            if player.x <= 5 and not self.dragon_defeated:
+                self.current_room = 'elite2'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5 and self.dragon_defeated:
+                self.current_room = 'obby'
+                player.x, player.y = 50, 500
+        elif self.current_room == 'obby':
+            # Obby fall reset is handled earlier
+            if player.x >= 750 and player.y < 350:
+                self.current_room = 'cartographer'
+                player.x = 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5 and player.y < 200:
+                self.current_room = 'skeletons'
+                player.x = 10
+            elif player.x <= 5:
+                self.current_room = 'dragon'
+                player.x = SCREEN_WIDTH - player.width - 10
+        elif self.current_room == 'cartographer':
+            if player.x <= 5:
+                self.current_room = 'obby'
+                player.x = 740
+                player.y = 280
+        elif self.current_room == 'skeletons':
+            if player.x <= 5:
+                self.current_room = 'obby'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                self.current_room = 'skeleton_boss'
+                player.x = 10
+        elif self.current_room == 'skeleton_boss':
+            if player.x <= 5:
+                self.current_room = 'skeletons'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                self.current_room = 'treasure'
+                player.x = 10
+        elif self.current_room == 'treasure':
+            if player.x <= 5:
+                self.current_room = 'skeleton_boss'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                self.current_room = 'shop'
+                player.x = 10
+        elif self.current_room == 'shop':
+            if player.x <= 5:
+                self.current_room = 'treasure'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                self.current_room = 'cliffs'
+                player.x = 10
+        elif self.current_room == 'cliffs':
+            if player.x <= 5:
+                self.current_room = 'shop'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5 and player.y < 200:
+                self.current_room = 'crystal_plains'
+                player.x = 10
+        elif self.current_room == 'crystal_plains':
+            if player.x <= 5:
+                self.current_room = 'cliffs'
+                player.x = SCREEN_WIDTH - player.width - 10
+            elif player.x >= SCREEN_WIDTH - player.width - 5:
+                self.events.emit(Notice("🎉 YOU WIN! Game complete! 🎉", 9999))
+        if self.current_room != came_from:
+            self.events.emit(RoomEntered(self.current_room, came_from))
+    
+    def draw(self, screen):
+        player = self.player
+        screen.fill(WHITE)
+        self.render_system(self.room, screen)
+        for knight in self.players:
+            knight.draw(screen)
+        self.profiler.lap(WORLD_DRAW)
         
         # Minimap (only if you have it!)
         if player.has_map:
-            draw_minimap(screen, rooms, current_room, player)
+            draw_minimap(screen, self.rooms, self.current_room, player)
         
         # Coin counter
         pygame.draw.rect(screen, DARK_GRAY, (SCREEN_WIDTH-120, 10, 110, 30))
@@ -1631,8 +2183,8 @@ def main():
             pygame.draw.rect(screen, CYAN, (15, 95, 130, 10))
             pygame.draw.rect(screen, GOLD, (10, 90, 140, 20), 2)
         
-        if message_timer > 0:
-            msg_width = min(500, len(message) * 8 + 20)
+        if self.hud.timer > 0:
+            msg_width = min(500, len(self.hud.text) * 8 + 20)
             msg_height = 50
             msg_x = SCREEN_WIDTH // 2 - msg_width // 2
             msg_y = 20
@@ -1641,13 +2193,146 @@ def main():
             pygame.draw.rect(screen, DARK_GRAY, (msg_x + 2, msg_y + 2, msg_width - 4, msg_height - 4))
             pygame.draw.rect(screen, GOLD, (msg_x, msg_y, msg_width, msg_height), 3)
             pygame.draw.rect(screen, YELLOW, (msg_x + 3, msg_y + 3, msg_width - 6, msg_height - 6), 1)
-            
-            message_timer -= 1
         
+        # Rewind arrows
+        if self.rewinding:
+            for i in range(2):
+                tip = SCREEN_WIDTH // 2 - 30 + i * 25
+                pygame.draw.polygon(screen, CYAN, [(tip, 95), (tip + 25, 80), (tip + 25, 110)])
+        self.profiler.draw(screen)
+        self.profiler.lap(HUD)
+
+
+def play_headless(recording, memory=None):
+    """Run a recording as fast as possible with no window. Returns the world.
+    With memory, a MemoryMonitor report is written there at the end"""
+    world = World(recording.seed, recording.fixed_point)
+    monitor = MemoryMonitor(world) if memory else None
+    for inputs in recording:
+        world.step(inputs)
+    if monitor is not None:
+        monitor.save(memory)
+    return world
+
+
+def main(seed=None, fixed_point=False, record=None, replay=None, telemetry=None,
+         autosave=None, resume=None, profile_frames=300, memory=None):
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Knight's Adventure 🧭⚔️🐉")
+    clock = pygame.time.Clock()
+    
+    if replay:
+        playback = iter(replay)
+        seed, fixed_point = replay.seed, replay.fixed_point
+    elif record and seed is None:
+        # A recording is only useful if the run can be repeated
+        seed = random.randrange(2 ** 31)
+    recording = Recording(seed, fixed_point) if record else None
+    world = World(seed, fixed_point)
+    world.achievements.on_unlock = lambda name, description: print(f"Achievement: {description}")
+    world.autosave_path = autosave
+    if resume:
+        with open(resume, 'rb') as f:
+            world.restore(f.read())
+    monitor = MemoryMonitor(world) if memory else None
+    
+    profiler = world.profiler
+    capture = Capture(profile_frames)
+    draw_stats = DrawStats()  # F4
+    running = True
+    while running:
+        clock.tick(FPS)
+        frame_start = time.perf_counter()
+        profiler.start_frame()
+        
+        events = pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
+                profiler.start_frame()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                if capture.start(world.current_room):
+                    world.events.emit(Notice(f"Profiling {capture.frames} frames...", 60))
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                if draw_stats.installed:
+                    draw_stats.uninstall()
+                    print(draw_stats.table())
+                else:
+                    draw_stats.install()
+        
+        if replay:
+            inputs = next(playback, None)
+            if inputs is None:
+                break
+        else:
+            inputs = read_input(events, pygame.key.get_pressed())
+        if recording is not None:
+            recording.add(inputs)
+        
+        profiler.lap(INPUT)
+        
+        world.step(inputs)
+        world.draw(draw_stats.screen(screen))
+        draw_stats.end_frame()
         pygame.display.flip()
+        profiler.lap(FLIP)
+        # Whatever's left of the frame goes to work that could wait
+        world.jobs.run(frame_start)
+        profiler.lap(JOBS)
+        profiler.end_frame()
+        saved = capture.end_frame()
+        if saved:
+            print(f"Profile saved to {saved[0]} and {saved[1]}")
+            world.events.emit(Notice("Profile saved!", 90))
     
+    world.jobs.run_all()  # Don't quit with the autosave half done
+    if draw_stats.installed:
+        draw_stats.uninstall()
+        print(draw_stats.table())
+    if recording is not None:
+        recording.save(record)
+        print(f"Recorded {len(recording)} frames to {record}")
+    if telemetry:
+        summary = world.telemetry.summary()
+        summary['achievements'] = world.achievements.unlocked
+        with open(telemetry, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if monitor is not None:
+        monitor.save(memory)
+        for suspect in monitor.suspects:
+            print(f"Memory: {suspect['text']}")
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Knight's Adventure")
+    parser.add_argument('--seed', type=int, help="seed the world for a repeatable run")
+    parser.add_argument('--fixed-point', action='store_true',
+                        help="snap physics to 1/256 px so runs match across machines")
+    parser.add_argument('--record', metavar='FILE', help="record every frame's input to FILE")
+    parser.add_argument('--replay', metavar='FILE', help="play back a recording")
+    parser.add_argument('--telemetry', metavar='FILE', help="write event counts and achievements to FILE")
+    parser.add_argument('--autosave', metavar='FILE', help="save to FILE on every room change")
+    parser.add_argument('--resume', metavar='FILE', help="carry on from an --autosave file")
+    parser.add_argument('--profile-frames', type=int, default=300, metavar='N',
+                        help="how many frames F9 profiles for")
+    parser.add_argument('--memory', metavar='FILE',
+                        help="sample memory on every room change and write a JSON report to FILE")
+    parser.add_argument('--headless', action='store_true',
+                        help="with --replay: no window, run as fast as possible")
+    args = parser.parse_args()
+    if args.replay and args.headless:
+        recording = Recording.load(args.replay)
+        start = time.perf_counter()
+        world = play_headless(recording, args.memory)
+        seconds = time.perf_counter() - start
+        print(f"{len(recording)} frames in {seconds:.2f}s "
+              f"({len(recording) / max(seconds, 1e-9):.0f} frames/s), state {world.state_hash()}")
+    else:
+        main(args.seed, args.fixed_point, args.record,
+             Recording.load(args.replay) if args.replay else None, args.telemetry,
+             args.autosave, args.resume, args.profile_frames, args.memory)
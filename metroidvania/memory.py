@@ -0,0 +1,236 @@
+"""
+Memory accounting for Knight's Adventure.
+
+A MemoryMonitor hangs off a World's event bus and takes a sample every time
+the knight goes through a door. Each sample has:
+
+    traced_kb / peak_kb - what tracemalloc sees Python holding right now
+    growth              - the source lines that allocated most since the
+                          last sample (tracemalloc snapshot diff)
+    rooms               - bytes and objects reachable from each room, plus
+                          how many projectiles its pools still have flying
+    classes             - bytes, objects and instances by entity class
+
+Bytes are found by walking gc.get_referents() out from every room (and the
+knights, as 'players'), and each object is charged to the nearest game
+object that owns it: a Dragon's fireball pool is the Dragon's, but the
+Fireballs in it are Fireball's, and the list of SlashEffects on the knight
+is the Player's while the effects themselves are SlashEffect's. Nothing is
+counted twice, and the walk stops at the World and anything it holds that
+isn't a room or a knight (event bus, jobs, ...), so rooms are only charged
+for what they keep alive. It also stops at anything reachable from the
+game's module globals (flight patterns, sine tables, fonts, the constants in
+its code): every room shares those, and whichever room got walked first
+would be charged for them.
+
+Leaks show up as things that only ever go up. After every sample the
+monitor looks for:
+    - a class whose bytes grew on each of the last few samples (a list that
+      is appended to and never cleared)
+    - a room that is bigger on each of the last few visits
+    - rooms from before a restart that are still alive after it (something
+      still holds the old create_rooms() world)
+
+    python game.py --memory memory.json
+    python game.py --replay run.krec --headless --memory memory.json
+
+The report is JSON: {"samples": [...], "suspects": [...]}.
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import types
+import weakref
+
+from events import RoomEntered
+
+# Never walked into: code and classes aren't per-room memory, and a bound
+# method would lead straight back to the World
+SKIP = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+        types.MethodType, types.CodeType, weakref.ref)
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def owner_class(obj):
+    """The class name to charge obj to, if it's a game object (not a list, dict, int...)"""
+    cls = type(obj)
+    module = cls.__module__
+    if module == 'builtins' or module.startswith(('pygame', 'numpy', 'random', 'array', 'collections')):
+        return None
+    return cls.__name__
+
+
+def measure(roots, seen, stop, classes):
+    """Walk out from roots charging every new object to its owner in classes.
+    Returns (bytes, objects) for the whole walk"""
+    total = count = 0
+    stack = [(root, None) for root in roots]
+    while stack:
+        obj, owner = stack.pop()
+        key = id(obj)
+        if key in seen or key in stop or isinstance(obj, SKIP):
+            continue
+        seen.add(key)
+        name = owner_class(obj)
+        if name is not None:
+            owner = name
+        size = sys.getsizeof(obj, 0)
+        total += size
+        count += 1
+        if owner is not None:
+            entry = classes.setdefault(owner, {'bytes': 0, 'objects': 0, 'instances': 0})
+            entry['bytes'] += size
+            entry['objects'] += 1
+            if name is not None:
+                entry['instances'] += 1
+        for child in gc.get_referents(obj):
+            stack.append((child, owner))
+    return total, count
+
+
+def shared():
+    """ids of everything reachable from the globals of the game's own modules,
+    including the constants in their functions and classes' methods"""
+    found = set()
+    stack = []
+    modules = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and path.endswith('.py') and os.path.dirname(os.path.abspath(path)) == HERE:
+            modules.add(module.__name__)
+            stack.extend(vars(module).values())
+    while stack:
+        obj = stack.pop()
+        key = id(obj)
+        if key in found:
+            continue
+        found.add(key)
+        if isinstance(obj, type):
+            if obj.__module__ in modules:
+                stack.extend(vars(obj).values())
+        elif isinstance(obj, types.FunctionType):
+            stack.append(obj.__code__)
+        elif isinstance(obj, types.CodeType):
+            stack.extend(obj.co_consts)
+        elif not isinstance(obj, SKIP):
+            stack.extend(gc.get_referents(obj))
+    return found
+
+
+class MemoryMonitor:
+    """Samples a World's memory on every room change (see the module docstring)"""
+    def __init__(self, world, streak=4, top=10):
+        self.world = world
+        self.streak = streak  # How many rises in a row count as a leak
+        self.top = top
+        self.samples = []
+        self.suspects = []
+        self.flagged = set()  # (kind, what), so each leak is reported once
+        self.started = time.perf_counter()
+        self.old_rooms = []   # Weak references to rooms from before a restart
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.snapshot = self.take_snapshot()
+        world.events.on(RoomEntered, self.room_entered, replays=False)
+        self.sample('start', None)
+    
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+    
+    def room_entered(self, event):
+        self.sample(event.room, event.came_from)
+    
+    def sample(self, room, came_from):
+        world = self.world
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self.take_snapshot()
+        growth = [{
+            'where': f"{stat.traceback[0].filename.rsplit('/', 1)[-1]}:{stat.traceback[0].lineno}",
+            'kb': stat.size_diff / 1024,
+            'blocks': stat.count_diff,
+        } for stat in snapshot.compare_to(self.snapshot, 'lineno')[:self.top] if stat.size_diff > 0]
+        self.snapshot = snapshot
+    
+        stop = shared()
+        stop.update((id(world), id(world.players)))
+        stop.update(id(value) for value in vars(world).values())
+        stop.update(id(room) for room in world.rooms.values())
+        seen = set()
+        classes = {}
+        rooms = {}
+        for name, room_object in world.rooms.items():
+            stop.discard(id(room_object))
+            size, count = measure([room_object], seen, stop, classes)
+            stop.add(id(room_object))
+            rooms[name] = {
+                'bytes': size,
+                'objects': count,
+                'projectiles': sum(len(pool) for pool in room_object.projectiles),
+            }
+        stop.difference_update(id(player) for player in world.players)
+        size, count = measure(world.players, seen, stop, classes)
+        rooms['players'] = {'bytes': size, 'objects': count, 'projectiles': 0}
+    
+        entry = {
+            'sample': len(self.samples),
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'room': room,
+            'from': came_from,
+            'traced_kb': current / 1024,
+            'peak_kb': peak / 1024,
+            'growth': growth,
+            'rooms': rooms,
+            'classes': dict(sorted(classes.items(), key=lambda item: -item[1]['bytes'])),
+        }
+        self.samples.append(entry)
+        self.check(entry)
+        self.track_rooms()
+        return entry
+    
+    def track_rooms(self):
+        """Remember this world's rooms weakly, and complain about any from before a restart"""
+        gc.collect()
+        alive = [ref() for ref in self.old_rooms]
+        alive = [room for room in alive if room is not None and room not in self.world.rooms.values()]
+        if alive:
+            self.suspect('stale rooms', id(alive[0]), f"{len(alive)} rooms from before a restart are still alive",
+                         rooms=sorted({room.name for room in alive}))
+        self.old_rooms = [weakref.ref(room) for room in self.world.rooms.values()]
+    
+    def check(self, entry):
+        streak = self.streak
+        history = self.samples[-(streak + 1):]
+        if len(history) > streak:
+            for name, stats in entry['classes'].items():
+                sizes = [sample['classes'].get(name, {}).get('bytes', 0) for sample in history]
+                if all(b > a for a, b in zip(sizes, sizes[1:])):
+                    self.suspect('class growth', name, f"{name} grew on each of the last {streak} room changes "
+                                 f"({sizes[0]} -> {sizes[-1]} bytes)", cls=name, bytes=sizes)
+        # The same room, visit after visit
+        room = entry['room']
+        visits = [sample['rooms'][room]['bytes'] for sample in self.samples
+                  if sample['room'] == room and room in sample['rooms']][-(streak + 1):]
+        if len(visits) > streak and all(b > a for a, b in zip(visits, visits[1:])):
+            self.suspect('room growth', room, f"{room} was bigger on each of the last {streak} visits "
+                         f"({visits[0]} -> {visits[-1]} bytes)", room=room, bytes=visits)
+    
+    def suspect(self, kind, what, text, **details):
+        if (kind, what) in self.flagged:
+            return
+        self.flagged.add((kind, what))
+        self.suspects.append(dict(kind=kind, text=text, sample=len(self.samples) - 1, **details))
+    
+    def report(self):
+        return {'samples': self.samples, 'suspects': self.suspects}
+    
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=1)
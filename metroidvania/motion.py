@@ -0,0 +1,206 @@
+"""
+Motion patterns for Knight's Adventure.
+
+Flyers used to call math.sin/math.cos every frame for their paths, and
+wings, shells and glows did the same when drawing. Here one sine table is
+worked out at import, and each flight pattern bakes its whole loop into a
+table of (x, y) offsets from the flyer's start point, indexed by its angle.
+A flyer's position is then a table lookup, and a room full of them moves in
+one vectorized FlightEngine step.
+
+A Pattern is just data: an angle step per frame, sine terms for x and y, and
+optionally a back-and-forth patrol for the whole loop (that's 'hover').
+Adding a pattern means adding a line to PATTERNS.
+
+The tables are built once, at import (as NumPy arrays when it's there),
+and every room's engine and every flyer share them.
+Flyers are proxies like patrollers (see engine.py). Without NumPy rooms have
+no engine and each flyer runs its own update().
+"""
+
+import math
+
+from engine import Engine, Proxy, np
+
+TABLE_SIZE = 4096  # A power of two, so wrapping is a mask
+MASK = TABLE_SIZE - 1
+QUARTER = TABLE_SIZE // 4
+SCALE = TABLE_SIZE / (2 * math.pi)  # Table steps per radian
+
+SINE = [math.sin(i / SCALE) for i in range(TABLE_SIZE)]
+
+
+def sin(angle):
+    """math.sin(angle) to within 1/650th of a turn, from the table"""
+    return SINE[int(angle * SCALE) & MASK]
+
+
+def cos(angle):
+    return SINE[(int(angle * SCALE) + QUARTER) & MASK]
+
+
+class Pattern:
+    """A looping flight path.
+
+    x and y are (amplitude, harmonic, phase) terms; the offset from the
+    start point is the sum of amplitude * sin(harmonic * angle + phase).
+    A harmonic of 0 gives a constant. patrol_range > 0 also walks the whole
+    loop back and forth that far either side of the start at the flyer's
+    speed. The baked offsets live in row `index` of PATH_X and PATH_Y.
+    """
+    __slots__ = ('name', 'step', 'x', 'y', 'patrol_range', 'index')
+
+    def __init__(self, name, step, x=(), y=(), patrol_range=0):
+        self.name = name
+        self.step = step
+        self.x = tuple(x)
+        self.y = tuple(y)
+        self.patrol_range = patrol_range
+        self.index = -1
+
+
+PATTERNS = {pattern.name: pattern for pattern in (
+    # x = 80 cos, y = 60 sin
+    Pattern('circle', 0.05, x=[(80, 1, math.pi / 2)], y=[(60, 1, 0)]),
+    # Bob up and down while patrolling
+    Pattern('hover', 0.08, y=[(40, 1, 0)], patrol_range=100),
+    # Sideways 8: twice as fast up and down as across
+    Pattern('figure_eight', 0.04, x=[(90, 1, math.pi / 2)], y=[(40, 2, 0)]),
+    # High at both ends, diving 90 px through the middle (y = 90 sin^2)
+    Pattern('swoop', 0.035, x=[(140, 1, math.pi / 2)], y=[(45, 0, math.pi / 2), (45, 2, -math.pi / 2)]),
+)}
+for index, pattern in enumerate(PATTERNS.values()):
+    pattern.index = index
+
+
+def bake(terms):
+    """A pattern's offsets at every table angle"""
+    if np is None:
+        angles = [i / SCALE for i in range(TABLE_SIZE)]
+        return [sum(amplitude * math.sin(harmonic * angle + phase) for amplitude, harmonic, phase in terms)
+                for angle in angles]
+    angles = np.arange(TABLE_SIZE) / SCALE
+    path = np.zeros(TABLE_SIZE)
+    for amplitude, harmonic, phase in terms:
+        path = path + amplitude * np.sin(harmonic * angles + phase)
+    return path
+
+
+# One row per pattern, so each flyer looks up its own row. These are the only
+# copies: NumPy arrays with it (the engine indexes them in bulk), lists without.
+if np is not None:
+    PATH_X = np.array([bake(pattern.x) for pattern in PATTERNS.values()])
+    PATH_Y = np.array([bake(pattern.y) for pattern in PATTERNS.values()])
+    STEPS = np.array([pattern.step for pattern in PATTERNS.values()])
+    RANGES = np.array([pattern.patrol_range for pattern in PATTERNS.values()], dtype='float64')
+else:
+    PATH_X = [bake(pattern.x) for pattern in PATTERNS.values()]
+    PATH_Y = [bake(pattern.y) for pattern in PATTERNS.values()]
+
+# Everything the engine owns, and how it's stored
+FIELDS = (
+    ('x', 'float64'),
+    ('y', 'float64'),
+    ('base_x', 'float64'),   # Where the loop is centred (moves for patrolling patterns)
+    ('start_x', 'float64'),
+    ('start_y', 'float64'),
+    ('angle', 'float64'),
+    ('speed', 'float64'),
+    ('direction', 'int64'),
+    ('health', 'int64'),
+    ('hit_flash', 'int64'),
+)
+
+
+class Flyer(Proxy):
+    """Base for enemies that follow a Pattern around their start point"""
+    __slots__ = ('pattern', 'fixed_point') + tuple(name for name, _ in FIELDS)
+
+    def __init__(self):
+        Proxy.__init__(self)
+        self.fixed_point = False
+
+    def update(self):
+        pattern = self.pattern
+        self.angle += pattern.step
+        if pattern.patrol_range:
+            self.base_x += self.speed * self.direction
+            if abs(self.base_x - self.start_x) > pattern.patrol_range:
+                self.direction *= -1
+        i = int(self.angle * SCALE) & MASK
+        self.x = self.base_x + float(PATH_X[pattern.index][i])
+        self.y = self.start_y + float(PATH_Y[pattern.index][i])
+        if self.fixed_point:
+            self.x, self.y = round(self.x * 256) / 256, round(self.y * 256) / 256
+        self.rect.x, self.rect.y = int(self.x), int(self.y)
+        if self.hit_flash > 0:
+            self.hit_flash -= 1
+
+
+class FlightEngine(Engine):
+    """Structure-of-arrays state for every flyer in one room"""
+    fields = FIELDS
+    extra = (('pattern', 'int64'),)  # Row in the shared tables
+
+    def __init__(self, flyers=(), capacity=16, fixed_point=False):
+        # fixed_point snaps positions to 1/256 px like Flyer.update does
+        self.fixed_point = fixed_point
+        Engine.__init__(self, flyers, capacity)
+
+    def write(self, flyer):
+        Engine.write(self, flyer)
+        self.arrays['pattern'][flyer._slot] = flyer.pattern.index
+
+    def step(self, frames=1, publish=True):
+        """Move every flyer (same rules as Flyer.update). publish as for PatrolEngine.step"""
+        n = self.count
+        if n == 0:
+            return
+        arrays = self.arrays
+        x, y, base_x = arrays['x'][:n], arrays['y'][:n], arrays['base_x'][:n]
+        angle, direction, flash = arrays['angle'][:n], arrays['direction'][:n], arrays['hit_flash'][:n]
+        start_x, start_y, speed = arrays['start_x'][:n], arrays['start_y'][:n], arrays['speed'][:n]
+        patterns = arrays['pattern'][:n]
+        step = STEPS[patterns]
+        patrol_range = RANGES[patterns]
+        patrols = patrol_range > 0
+        turned = np.zeros(n, dtype=bool)
+        flashed = np.zeros(n, dtype=bool)
+        for _ in range(frames):
+            angle += step
+            base_x += np.where(patrols, speed * direction, 0)
+            turn = patrols & (np.abs(base_x - start_x) > patrol_range)
+            direction[turn] *= -1
+            turned |= turn
+            flashing = flash > 0
+            flash[flashing] -= 1
+            flashed |= flashing
+        index = (angle * SCALE).astype('int64') & MASK
+        x[:] = base_x + PATH_X[patterns, index]
+        y[:] = start_y + PATH_Y[patterns, index]
+        if self.fixed_point:
+            x[:] = np.round(x * 256) / 256
+            y[:] = np.round(y * 256) / 256
+        if not publish:
+            self.stale = True
+        elif self.stale:
+            self.publish()
+        else:
+            self.publish(turned, flashed)
+
+    def publish(self, turned=None, flashed=None):
+        self.stale = False
+        n = self.count
+        arrays = self.arrays
+        x, y = arrays['x'][:n], arrays['y'][:n]
+        members = self.members
+        for flyer, left, top, column, row, turn_angle, centre in zip(
+                members, x.tolist(), y.tolist(), x.astype('int64').tolist(), y.astype('int64').tolist(),
+                arrays['angle'][:n].tolist(), arrays['base_x'][:n].tolist()):
+            flyer.x, flyer.y, flyer.angle, flyer.base_x = left, top, turn_angle, centre
+            flyer.rect.x, flyer.rect.y = column, row
+        direction, flash = arrays['direction'], arrays['hit_flash']
+        for i in range(n) if turned is None else np.flatnonzero(turned).tolist():
+            members[i].direction = int(direction[i])
+        for i in range(n) if flashed is None else np.flatnonzero(flashed).tolist():
+            members[i].hit_flash = int(flash[i])
@@ -0,0 +1,238 @@
+"""
+Platform navigation for Knight's Adventure.
+
+A NavGraph has one node per platform (its top is somewhere to stand) and an
+edge for every way to get from one platform to another:
+
+    walk - the platforms meet at the same height
+    drop - walk off an end and fall onto the other one
+    jump - jump from a spot on this one and land on the other
+
+Edges come from replaying the same frame-by-frame physics Body.move() uses
+(gravity, then move), for a body of a given width, jump power and speed, so
+an edge in the graph is a move that body can actually make. Drops skip
+targets with another platform in the way; jump arcs only check the two
+platforms involved, and if something else is in the way the body lands
+somewhere unplanned and simply plans again from there.
+
+graph_for() keeps every graph in memory and on disk (navcache/), keyed by a
+hash of the layout and the physics. Today's rooms build in well under a
+millisecond, about as fast as reading the file back, but building grows
+with the square of the platform count and the disk copy doesn't.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+
+WALK = 'walk'
+DROP = 'drop'
+JUMP = 'jump'
+
+VERSION = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'navcache')
+MAX_FRAMES = 240  # Longest fall worth planning
+
+
+class Edge:
+    """One move. takeoff and landing are the body's x (left side) at each end"""
+    __slots__ = ('kind', 'source', 'target', 'takeoff', 'landing', 'cost')
+
+    def __init__(self, kind, source, target, takeoff, landing, cost):
+        self.kind = kind
+        self.source = source
+        self.target = target
+        self.takeoff = takeoff
+        self.landing = landing
+        self.cost = cost  # Frames, counting the walk to the takeoff and from the landing
+
+
+def flight(vel_y, gravity, rise):
+    """Follow a body launched at vel_y (negative is up). Returns (frames until
+    its feet are above a platform rise pixels higher, frames until it comes
+    down onto it), or None if it never gets that high."""
+    height = 0.0  # Feet above where it started
+    clear = 0 if rise <= 0 else None
+    for frame in range(1, MAX_FRAMES):
+        vel_y += gravity
+        height -= vel_y
+        if clear is None:
+            if height >= rise:
+                clear = frame
+            elif vel_y > 0:
+                return None  # Peaked below it
+        elif vel_y > 0 and height <= rise:
+            return clear, frame
+    return None
+
+
+class NavGraph:
+    """Walk, drop and jump edges between a room's platforms"""
+    def __init__(self, platforms, edges=None, width=20, jump_power=12, gravity=0.6, speed=5):
+        self.platforms = platforms
+        self.width = width
+        self.jump_power = jump_power
+        self.gravity = gravity
+        self.speed = speed
+        self.centers = [platform.centerx - width / 2 for platform in platforms]
+        if edges is None:
+            edges = self.build()
+        self.edges = {node: [] for node in range(len(platforms))}
+        for edge in edges:
+            self.edges[edge.source].append(edge)
+
+    def build(self):
+        edges = []
+        for source, a in enumerate(self.platforms):
+            for target, b in enumerate(self.platforms):
+                if source != target:
+                    edges.extend(self.moves(source, a, target, b))
+        return edges
+
+    def edge(self, kind, source, target, takeoff, landing, air):
+        """An edge costed as walk to takeoff + air time + walk from landing, in frames"""
+        speed = self.speed
+        cost = (abs(takeoff - self.centers[source]) / speed + air
+                + abs(self.centers[target] - landing) / speed)
+        return Edge(kind, source, target, takeoff, landing, cost)
+
+    def moves(self, source, a, target, b):
+        width, speed = self.width, self.speed
+        found = []
+        if a.top == b.top and (a.right == b.left or b.right == a.left):
+            takeoff = a.right - width if a.right == b.left else a.left
+            landing = b.left if a.right == b.left else b.right - width
+            found.append(self.edge(WALK, source, target, takeoff, landing, 0))
+            return found
+
+        rise = a.top - b.top  # How much higher b is
+        # Drop: walk off an end of a and fall onto b
+        if rise < 0:
+            times = flight(0.0, self.gravity, rise)
+            if times:
+                air = times[1]
+                reach = speed * air
+                if b.right > a.right and b.left < a.right + reach:
+                    landing = min(max(a.right + reach, b.left), b.right - width)
+                    if not self.in_the_way(a, b, a.right, landing):
+                        found.append(self.edge(DROP, source, target, a.right, landing, air))
+                if b.left < a.left and b.right > a.left - reach:
+                    landing = max(min(a.left - width - reach, b.right - width), b.left)
+                    if not self.in_the_way(a, b, landing, a.left - width):
+                        found.append(self.edge(DROP, source, target, a.left - width, landing, air))
+
+        # Jump: take off from a, stay outside b until the feet are above it,
+        # then come down on it. Going down is left to drops, since a jump
+        # from the middle of a would just land back on a.
+        if rise < 0:
+            return found
+        times = flight(-self.jump_power, self.gravity, rise)
+        if not times:
+            return found
+        clear, air = times
+        if rise > 0:
+            sides = (-1, 1)
+        else:
+            sides = (1,) if b.centerx > a.centerx else (-1,)
+        for side in sides:
+            if side > 0:  # Coming at b from its left
+                takeoff = b.left - width - speed * clear
+            else:
+                takeoff = b.right + speed * clear
+            takeoff = min(max(takeoff, a.left - width + 1), a.right - 1)  # Somewhere on a
+            if rise > 0 and takeoff + width > b.left and takeoff < b.right:
+                continue  # Would bump into b from below
+            furthest = takeoff + side * speed * air
+            if furthest + width <= b.left or furthest >= b.right:
+                if (furthest < b.left) == (takeoff < b.left):
+                    continue  # Can't get far enough
+            landing = min(max(furthest, b.left), b.right - width)
+            found.append(self.edge(JUMP, source, target, takeoff, landing, air))
+        return found
+
+    def in_the_way(self, a, b, left, right):
+        """Whether a platform between a and b's heights overlaps the fall from
+        x = left..right (body lefts)"""
+        for platform in self.platforms:
+            if (a.top < platform.top < b.top and platform.left < right + self.width
+                    and platform.right > left):
+                return True
+        return False
+
+    def find_path(self, start, goal):
+        """A* from platform start to platform goal. A list of edges, or None"""
+        if start == goal:
+            return []
+        centers, speed = self.centers, self.speed
+        goal_x = centers[goal]
+        frontier = [(abs(centers[start] - goal_x) / speed, 0.0, start)]
+        best = {start: 0.0}
+        came_from = {}
+        while frontier:
+            _, cost, node = heapq.heappop(frontier)
+            if node == goal:
+                path = []
+                while node != start:
+                    edge = came_from[node]
+                    path.append(edge)
+                    node = edge.source
+                path.reverse()
+                return path
+            if cost > best[node]:
+                continue
+            for edge in self.edges[node]:
+                total = cost + edge.cost
+                if total < best.get(edge.target, float('inf')):
+                    best[edge.target] = total
+                    came_from[edge.target] = edge
+                    guess = total + abs(centers[edge.target] - goal_x) / speed
+                    heapq.heappush(frontier, (guess, total, edge.target))
+        return None
+
+    def save(self, path):
+        rows = [[edge.kind, edge.source, edge.target, edge.takeoff, edge.landing, edge.cost]
+                for edges in self.edges.values() for edge in edges]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = path + '.tmp'
+        with open(partial, 'w') as f:
+            json.dump({'version': VERSION, 'edges': rows}, f)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path, platforms, **physics):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} nav graph")
+        return cls(platforms, [Edge(*row) for row in data['edges']], **physics)
+
+
+def layout_key(platforms, **physics):
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(repr((VERSION, [tuple(platform) for platform in platforms],
+                        sorted(physics.items()))).encode())
+    return digest.hexdigest()
+
+
+_graphs = {}
+
+
+def graph_for(platforms, cache_dir=CACHE_DIR, **physics):
+    """The NavGraph for these platforms and physics (width, jump_power,
+    gravity, speed), from memory, the disk cache, or built fresh"""
+    key = layout_key(platforms, **physics)
+    graph = _graphs.get(key)
+    if graph is not None:
+        return graph
+    path = os.path.join(cache_dir, key + '.json')
+    try:
+        graph = NavGraph.load(path, platforms, **physics)
+    except (OSError, ValueError, KeyError, TypeError):
+        graph = NavGraph(platforms, **physics)
+        try:
+            graph.save(path)
+        except OSError:
+            pass  # Read-only install; just rebuild next time
+    _graphs[key] = graph
+    return graph
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Rollback netplay for two-knight co-op.
+
+Each peer runs the whole co-op World and only ever sends its own input. When
+the other knight's input for a frame hasn't arrived yet, the session guesses
+(the peer keeps holding whatever it held last) and carries on. When the real
+input turns up and the guess was wrong, it restores the snapshot from that
+frame and re-runs every frame since with the right inputs, all within one
+tick. Because the World is deterministic both peers end up in the same state.
+
+A packet is a small header plus every input the peer hasn't confirmed yet,
+so a lost packet is simply covered by the next one.
+
+Try it on one machine with two terminals:
+    python netplay.py --player 0 --port 7000 --peer-port 7001 --latency 80 --loss 0.1
+    python netplay.py --player 1 --port 7001 --peer-port 7000 --latency 80 --loss 0.1
+Add --headless --frames 1200 to both for a bot run that prints the final
+state hash (they should match).
+"""
+
+import argparse
+import heapq
+import os
+import random
+import socket
+import struct
+import sys
+import time
+
+import pygame
+
+from replay import read_input, IN_LEFT, IN_RIGHT, IN_X_HELD, IN_UP, IN_X, IN_D
+
+PACKET = struct.Struct('<II')  # first input frame in the packet, how many of the peer's inputs we have
+HELD = IN_LEFT | IN_RIGHT | IN_X_HELD  # What a prediction repeats (presses aren't repeated)
+
+
+class LossyLink:
+    """A non-blocking UDP socket that can fake latency, jitter and packet loss"""
+    def __init__(self, port, peer, latency=0, jitter=0, loss=0.0, seed=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('0.0.0.0', port))
+        self.sock.setblocking(False)
+        self.peer = peer
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.outbox = []  # (due time, sequence, packet) heap of delayed packets
+        self.sequence = 0
+        self.sent = self.dropped = 0
+
+    def send(self, packet):
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        if not self.latency and not self.jitter:
+            self._send(packet)
+            return
+        due = time.monotonic() + self.latency + self.rng.uniform(0, self.jitter)
+        self.sequence += 1
+        heapq.heappush(self.outbox, (due, self.sequence, packet))
+
+    def _send(self, packet):
+        try:
+            self.sock.sendto(packet, self.peer)
+        except OSError:
+            pass  # Peer not up yet; the next packet carries the same inputs
+
+    def flush(self):
+        now = time.monotonic()
+        while self.outbox and self.outbox[0][0] <= now:
+            self._send(heapq.heappop(self.outbox)[2])
+
+    def receive(self):
+        """Every packet waiting on the socket"""
+        self.flush()
+        packets = []
+        while True:
+            try:
+                packet, _ = self.sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return packets
+            packets.append(packet)
+
+    def close(self):
+        self.sock.close()
+
+
+class RollbackSession:
+    """Keeps a co-op World in step with a peer that controls the other knight.
+
+    local is which knight this peer plays (0 or 1). delay frames of input
+    delay hide small latencies without any rollback; max_rollback is how far
+    ahead of the peer's confirmed input the session will run before it waits.
+    """
+    def __init__(self, world, local, link, delay=2, max_rollback=8):
+        self.world = world
+        self.local = local
+        self.link = link
+        self.delay = delay
+        self.max_rollback = max_rollback
+        self.frame = 0                              # Next frame to simulate
+        self.local_inputs = bytearray(delay)        # Ours, by frame (the first few are blank)
+        self.remote_inputs = bytearray()            # The peer's, confirmed, by frame
+        self.predicted = {}                         # Guesses used for frames not confirmed yet
+        self.peer_has = 0                           # How many of our inputs the peer has
+        self.snapshots = [None] * (max_rollback + 2)
+        self.rollbacks = 0
+        self.resimulated = 0
+        self.worst_rollback = 0.0                   # Seconds
+        self.stalls = 0
+
+    def advance(self, inputs):
+        """Run one frame with this peer's input. False if it had to wait for the peer"""
+        self.poll()
+        if self.frame - len(self.remote_inputs) >= self.max_rollback:
+            self.stalls += 1
+            self.send()
+            return False
+        self.local_inputs.append(inputs)
+        self.send()
+        self.snapshots[self.frame % len(self.snapshots)] = self.world.snapshot()
+        self.simulate(self.frame)
+        self.frame += 1
+        return True
+
+    def send(self):
+        start = self.peer_has
+        self.link.send(PACKET.pack(start, len(self.remote_inputs)) + self.local_inputs[start:])
+
+    def poll(self):
+        """Take in the peer's packets and roll back if a guess turned out wrong"""
+        wrong = None
+        for packet in self.link.receive():
+            first, peer_has = PACKET.unpack_from(packet)
+            self.peer_has = max(self.peer_has, peer_has)
+            known = len(self.remote_inputs)
+            if first > known:
+                continue  # Can't happen with in-order acks, but never leave a gap
+            new = packet[PACKET.size + known - first:]
+            for frame, bits in enumerate(new, known):
+                guess = self.predicted.pop(frame, None)
+                if guess is not None and guess != bits and wrong is None:
+                    wrong = frame
+            self.remote_inputs += new
+        if wrong is not None:
+            self.rollback(wrong)
+
+    def rollback(self, start):
+        """Restore the snapshot from frame start and re-run up to the present"""
+        begin = time.perf_counter()
+        world = self.world
+        world.restore(self.snapshots[start % len(self.snapshots)])
+        # Sounds, telemetry and achievements already saw these frames
+        world.events.replaying = True
+        for frame in range(start, self.frame):
+            if frame > start:
+                self.snapshots[frame % len(self.snapshots)] = world.snapshot()
+            self.simulate(frame)
+        world.events.replaying = False
+        self.rollbacks += 1
+        self.resimulated += self.frame - start
+        self.worst_rollback = max(self.worst_rollback, time.perf_counter() - begin)
+
+    def simulate(self, frame):
+        if frame < len(self.remote_inputs):
+            remote = self.remote_inputs[frame]
+        else:
+            last = self.remote_inputs[-1] if self.remote_inputs else 0
+            remote = self.predicted[frame] = last & HELD
+        local = self.local_inputs[frame]
+        if self.local == 0:
+            self.world.step(local, remote)
+        else:
+            self.world.step(remote, local)
+
+    def settle(self, timeout=5.0, linger=1.0):
+        """Keep talking until both sides have every input up to self.frame, so
+        the world is final. False if the peer went quiet first.
+        
+        Afterwards it keeps sending for linger seconds, in case the peer is
+        still waiting on packets that got lost.
+        """
+        deadline = time.monotonic() + timeout
+        while len(self.remote_inputs) < self.frame or self.peer_has < self.frame:
+            if time.monotonic() > deadline:
+                return False
+            self.poll()
+            self.send()
+            time.sleep(0.005)
+        deadline = time.monotonic() + linger
+        while time.monotonic() < deadline:
+            self.poll()
+            self.send()
+            time.sleep(0.005)
+        return True
+
+
+def bot_inputs(seed):
+    """Endless made-up input: walk about for half a second at a time, jump and swing now and then"""
+    rng = random.Random(seed)
+    held = 0
+    frame = 0
+    while True:
+        if frame % 30 == 0:
+            held = rng.choice([0, IN_LEFT, IN_RIGHT, IN_RIGHT, IN_RIGHT | IN_X_HELD])
+        press = rng.choice([IN_UP, IN_X, IN_D]) if rng.random() < 0.05 else 0
+        yield held | press
+        frame += 1
+
+
+def run(args):
+    import game
+
+    link = LossyLink(args.port, (args.peer_host, args.peer_port),
+                     args.latency, args.jitter, args.loss, seed=args.player)
+    world = game.World(args.seed, fixed_point=True, coop=True)
+    session = RollbackSession(world, args.player, link, args.delay, args.max_rollback)
+
+    if args.headless:
+        bot = bot_inputs(args.player)
+        inputs = next(bot)
+        next_frame = time.monotonic()
+        while session.frame < args.frames:
+            if session.advance(inputs):
+                inputs = next(bot)
+            next_frame += 1 / game.FPS
+            time.sleep(max(0, next_frame - time.monotonic()))
+    else:
+        screen = pygame.display.set_mode((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+        pygame.display.set_caption(f"Knight's Adventure - co-op, knight {args.player + 1}")
+        clock = pygame.time.Clock()
+        running = True
+        while running and (not args.frames or session.frame < args.frames):
+            clock.tick(game.FPS)
+            frame_start = time.perf_counter()
+            events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    running = False
+            session.advance(read_input(events, pygame.key.get_pressed()))
+            world.draw(screen)
+            pygame.display.flip()
+            world.jobs.run(frame_start)
+
+    settled = session.settle()
+    link.close()
+    print(f"knight {args.player + 1}: {session.frame} frames, {session.rollbacks} rollbacks "
+          f"({session.resimulated} frames re-run, worst {session.worst_rollback * 1000:.2f}ms), "
+          f"{session.stalls} stalls, {link.dropped}/{link.sent} packets dropped")
+    if settled:
+        print(f"state {world.state_hash()}")
+    else:
+        print("peer went quiet before the last inputs arrived; state not final")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Knight's Adventure co-op over UDP")
+    parser.add_argument('--player', type=int, choices=(0, 1), required=True,
+                        help="which knight this peer plays")
+    parser.add_argument('--port', type=int, required=True, help="local UDP port")
+    parser.add_argument('--peer-port', type=int, required=True)
+    parser.add_argument('--peer-host', default='127.0.0.1')
+    parser.add_argument('--seed', type=int, default=0, help="must match on both peers")
+    parser.add_argument('--delay', type=int, default=2, help="frames of input delay")
+    parser.add_argument('--max-rollback', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0, help="extra ms added to every packet")
+    parser.add_argument('--jitter', type=float, default=0, help="up to this many more ms, at random")
+    parser.add_argument('--loss', type=float, default=0.0, help="fraction of packets to drop")
+    parser.add_argument('--headless', action='store_true', help="bot input, no window")
+    parser.add_argument('--frames', type=int, default=0, help="stop after this many frames")
+    args = parser.parse_args()
+    if args.headless:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        args.frames = args.frames or 1200
+    run(args)
+    sys.exit()
@@ -0,0 +1,97 @@
+"""
+Patrol engine for Knight's Adventure.
+
+Black knights, skeletons and rolling enemies all walk back and forth around
+where they started. Instead of running that as a Python method per enemy,
+a PatrolEngine keeps their state in NumPy arrays and moves every patroller
+in a room in one step. The enemy objects stay around as thin proxies (see
+engine.py), so enemy.x and friends are plain attribute reads everywhere else
+(drawing reads them a lot).
+
+NumPy is optional. Without it rooms have no engine and each patroller runs
+its own update() instead.
+"""
+
+from engine import Engine, Proxy, np
+from snapshot import StateLayout
+
+# Everything the engine owns, and how it's stored
+FIELDS = (
+    ('x', 'float64'),
+    ('start_x', 'float64'),
+    ('speed', 'float64'),
+    ('move_range', 'float64'),
+    ('direction', 'int64'),
+    ('health', 'int64'),
+    ('hit_flash', 'int64'),
+)
+
+
+class Patroller(Proxy):
+    """Base for enemies that walk back and forth around start_x"""
+    __slots__ = tuple(name for name, _ in FIELDS)
+    state = StateLayout(('x', 'd'), ('direction', 'i'), ('health', 'i'), ('hit_flash', 'i'))
+
+    def update(self):
+        self.x += self.speed * self.direction
+        if abs(self.x - self.start_x) > self.move_range:
+            self.direction *= -1
+        self.rect.x = int(self.x)
+        if self.hit_flash > 0:
+            self.hit_flash -= 1
+
+
+class PatrolEngine(Engine):
+    """Structure-of-arrays state for every patroller in one room"""
+    fields = FIELDS
+
+    def step(self, frames=1, publish=True):
+        """Move every patroller (same rules as Patroller.update).
+        
+        frames > 1 runs several frames of arrays in a row and publishes once
+        at the end, which is how rooms the knight isn't in catch up cheaply.
+        With publish=False they don't even do that (see engine.py).
+        """
+        n = self.count
+        if n == 0:
+            return
+        arrays = self.arrays
+        x = arrays['x'][:n]
+        direction = arrays['direction'][:n]
+        speed = arrays['speed'][:n]
+        start_x = arrays['start_x'][:n]
+        move_range = arrays['move_range'][:n]
+        flash = arrays['hit_flash'][:n]
+        turned = np.zeros(n, dtype=bool)
+        flashed = np.zeros(n, dtype=bool)
+        for _ in range(frames):
+            x += speed * direction
+            turn = np.abs(x - start_x) > move_range
+            direction[turn] *= -1
+            turned |= turn
+            flashing = flash > 0
+            flash[flashing] -= 1
+            flashed |= flashing
+        if not publish:
+            self.stale = True
+        elif self.stale:
+            self.publish()
+        else:
+            self.publish(turned, flashed)
+
+    def publish(self, turned=None, flashed=None):
+        # Every x changes, but only a few turn around or flash on any frame,
+        # so only those get the rest. This loop is most of what a step costs.
+        self.stale = False
+        n = self.count
+        arrays = self.arrays
+        x = arrays['x'][:n]
+        members = self.members
+        for patroller, left, column in zip(members, x.tolist(), x.astype('int64').tolist()):
+            patroller.x = left
+            patroller.rect.x = column
+        direction, flash = arrays['direction'], arrays['hit_flash']
+        for i in range(n) if turned is None else np.flatnonzero(turned).tolist():
+            members[i].direction = int(direction[i])
+        for i in range(n) if flashed is None else np.flatnonzero(flashed).tolist():
+            members[i].hit_flash = int(flash[i])
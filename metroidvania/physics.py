@@ -0,0 +1,98 @@
+"""
+Platform physics for Knight's Adventure.
+
+Anything that falls and stands on platforms (the knight, elite knights) is a
+Body and goes through the same Body.move(), so they all collide the same way.
+
+Each room keeps its platforms in a PlatformIndex: the platforms bucketed into
+columns, with the candidate list for every column span worked out once and
+cached. A body only tests the platforms in the columns it covers, and the
+test itself is a single Rect.collidelistall() call, so a room full of
+jumping elites doesn't mean every one of them looping over every platform.
+The index also hands out the room's navigation graphs (see nav.py).
+"""
+
+import nav
+
+
+class PlatformIndex:
+    """A room's platforms, bucketed into columns cell pixels wide"""
+    def __init__(self, platforms, cell=100):
+        self.platforms = platforms
+        self.cell = cell
+        self.order = {id(platform): i for i, platform in enumerate(platforms)}
+        self.columns = {}
+        for platform in platforms:
+            for column in range(platform.left // cell, (platform.right - 1) // cell + 1):
+                self.columns.setdefault(column, set()).add(id(platform))
+        self.spans = {}  # (first column, last column) -> candidate platforms
+        self.graphs = {}
+
+    def near(self, rect):
+        """Platforms that could touch rect, in room order"""
+        span = (rect.left // self.cell, (rect.right - 1) // self.cell)
+        candidates = self.spans.get(span)
+        if candidates is None:
+            ids = set()
+            for column in range(span[0], span[1] + 1):
+                ids |= self.columns.get(column, set())
+            candidates = self.spans[span] = [platform for platform in self.platforms
+                                             if id(platform) in ids]
+        return candidates
+
+    def touching(self, rect):
+        """Platforms rect overlaps, in room order"""
+        candidates = self.near(rect)
+        return [candidates[i] for i in rect.collidelistall(candidates)]
+
+    def standing_on(self, rect):
+        """Index of the platform rect is standing on, or None in mid-air"""
+        for platform in self.near(rect):
+            if (abs(rect.bottom - platform.top) <= 2
+                    and rect.right > platform.left and rect.left < platform.right):
+                return self.order[id(platform)]
+        return None
+
+    def navigation(self, width, jump_power, gravity, speed):
+        """The NavGraph for a body with this size and physics"""
+        key = (width, jump_power, gravity, speed)
+        graph = self.graphs.get(key)
+        if graph is None:
+            graph = self.graphs[key] = nav.graph_for(self.platforms, width=width, jump_power=jump_power,
+                                                     gravity=gravity, speed=speed)
+        return graph
+
+    def __iter__(self):
+        return iter(self.platforms)
+
+
+class Body:
+    """Falls and lands on platforms.
+
+    Subclasses need x, y, width, height, vel_x, vel_y, on_ground and a rect.
+    """
+    __slots__ = ()
+
+    def move(self, platforms, dx):
+        """Move dx sideways then vel_y down, pushing out of any platform in the way.
+        Sideways pushes go by the sign of vel_x, not dx (the knight's dash)."""
+        rect = self.rect
+        self.x += dx
+        rect.x, rect.y = int(self.x), int(self.y)
+        for platform in platforms.touching(rect):
+            if self.vel_x > 0:  # Moving right
+                self.x = platform.left - self.width
+            elif self.vel_x < 0:  # Moving left
+                self.x = platform.right
+
+        self.y += self.vel_y
+        self.on_ground = False
+        rect.x, rect.y = int(self.x), int(self.y)
+        for platform in platforms.touching(rect):
+            if self.vel_y > 0:  # Falling
+                self.y = platform.top - self.height
+                self.vel_y = 0
+                self.on_ground = True
+            elif self.vel_y < 0:  # Jumping up
+                self.y = platform.bottom
+                self.vel_y = 0
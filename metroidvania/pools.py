@@ -0,0 +1,83 @@
+"""
+Projectile pools for Knight's Adventure.
+
+Bosses used to keep their fireballs, shockwaves and bones in plain lists,
+copy the list every frame and list.remove() the dead ones. A ProjectilePool
+instead keeps preallocated projectiles of one type packed at the front of a
+list, with an alive mask next to it. Killing a projectile just clears its
+flag (safe in the middle of a collision pass); compact() then swap-removes
+the dead ones to the back, where spawn() reuses them.
+
+A projectile type needs reset(x, y, direction), update(), is_alive() and
+pool/pool_slot attributes (the pool fills them in).
+"""
+
+
+class ProjectilePool:
+    """Preallocated projectiles of one type"""
+    def __init__(self, kind, capacity=8):
+        self.kind = kind
+        self.items = []
+        self.alive = bytearray()
+        self.count = 0  # Slots in use (live ones plus any killed since the last compact)
+        for _ in range(capacity):
+            self._grow()
+
+    def _grow(self):
+        projectile = self.kind(0, 0, 1)
+        projectile.pool = self
+        projectile.pool_slot = len(self.items)
+        self.items.append(projectile)
+        self.alive.append(0)
+
+    def spawn(self, x, y, direction):
+        """Fire a projectile, reusing a dead one if there is one"""
+        if self.count == len(self.items):
+            self._grow()
+        projectile = self.items[self.count]
+        projectile.reset(x, y, direction)
+        self.alive[self.count] = 1
+        self.count += 1
+        return projectile
+
+    def kill(self, projectile):
+        self.alive[projectile.pool_slot] = 0
+
+    def update(self):
+        items, alive = self.items, self.alive
+        for i in range(self.count):
+            if alive[i]:
+                projectile = items[i]
+                projectile.update()
+                if not projectile.is_alive():
+                    alive[i] = 0
+        self.compact()
+
+    def compact(self):
+        """Swap-remove every dead projectile so the live ones stay packed"""
+        items, alive = self.items, self.alive
+        i = 0
+        while i < self.count:
+            if alive[i]:
+                i += 1
+                continue
+            last = self.count - 1
+            items[i], items[last] = items[last], items[i]
+            alive[i], alive[last] = alive[last], 0
+            items[i].pool_slot = i
+            items[last].pool_slot = last
+            self.count -= 1
+
+    def clear(self):
+        for i in range(self.count):
+            self.alive[i] = 0
+        self.count = 0
+
+    def __iter__(self):
+        items, alive = self.items, self.alive
+        for i in range(self.count):
+            if alive[i]:
+                yield items[i]
+
+    def __len__(self):
+        return sum(self.alive[:self.count])
@@ -0,0 +1,239 @@
+"""
+Frame profiler for Knight's Adventure.
+
+The frame is cut into named scopes (input, player physics, enemy updates,
+boss updates, collision, ... flip) with lap(): each call charges the time
+since the previous lap to the scope it names, so one perf_counter_ns() read
+per boundary times the whole frame with no gaps. end_frame() copies the
+frame's row into a ring buffer of the last `frames` frames.
+
+F3 in the game shows a stacked frame-time graph in the corner. The graph is
+a cached surface: each frame scrolls it one pixel and paints just the new
+column, and the legend (with averages) is re-rendered twice a second, so
+the overlay itself costs next to nothing.
+
+Switched off, lap() is a method call that checks a flag and returns, and
+nothing else runs.
+
+For the detail the scopes can't give, F9 starts a Capture: cProfile runs
+for the next few hundred frames and the result is saved twice, as a .pstats
+file (python -m pstats, snakeviz) and as collapsed stacks, one
+"a;b;c microseconds" line per call path, which flamegraph.pl and speedscope
+read. cProfile only knows who called whom, not whole stacks, so the paths
+are rebuilt from those caller/callee pairs, with each call's time shared
+out between its callers in proportion. Recursion is cut at the first repeat.
+Files are named after the room the capture started in, so a slow room can
+be caught when it happens, however long the run took to get there.
+"""
+
+import cProfile
+import os
+import pstats
+import time
+from array import array
+from time import perf_counter_ns
+
+import pygame
+
+SCOPES = ('input', 'rewind', 'physics', 'off-screen', 'enemies', 'bosses', 'collision',
+          'transitions', 'world draw', 'hud', 'flip', 'jobs')
+(INPUT, REWIND, PHYSICS, OFF_SCREEN, ENEMIES, BOSSES, COLLISIONS,
+ TRANSITIONS, WORLD_DRAW, HUD, FLIP, JOBS) = range(len(SCOPES))
+
+COLORS = ((230, 230, 230), (0, 200, 255), (70, 130, 220), (120, 120, 120), (220, 50, 50),
+          (150, 30, 30), (255, 140, 0), (255, 220, 0), (50, 200, 100), (150, 50, 200),
+          (255, 105, 180), (139, 69, 19))
+
+GRAPH_WIDTH = 240
+GRAPH_HEIGHT = 100
+GRAPH_MS = 33.3  # Top of the graph: two frames at 60 fps
+BUDGET_MS = 1000 / 60
+BACKGROUND = (20, 20, 20)
+
+
+class Profiler:
+    """Per-scope frame times in a ring buffer, plus the F3 overlay"""
+    def __init__(self, frames=GRAPH_WIDTH):
+        self.frames = frames
+        self.ring = array('q', bytes(8 * frames * len(SCOPES)))  # ns, one row per frame
+        self.row = [0] * len(SCOPES)
+        self.recorded = 0  # Frames recorded so far
+        self.enabled = False
+        self.last = 0
+        self.graph = None
+        self.legend = None
+    
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled:
+            # Start clean: old rows would be from whenever it was last on
+            self.ring = array('q', bytes(len(self.ring) * 8))
+            self.recorded = 0
+            self.graph = self.legend = None
+    
+    def start_frame(self):
+        if self.enabled:
+            self.row = [0] * len(SCOPES)
+            self.last = perf_counter_ns()
+    
+    def lap(self, scope):
+        """Charge the time since the last lap to scope"""
+        if self.enabled:
+            now = perf_counter_ns()
+            self.row[scope] += now - self.last
+            self.last = now
+    
+    def end_frame(self):
+        if not self.enabled:
+            return
+        width = len(SCOPES)
+        start = (self.recorded % self.frames) * width
+        self.ring[start:start + width] = array('q', self.row)
+        self.recorded += 1
+        self.plot(self.row)
+        if self.recorded % 30 == 0:
+            self.legend = None
+    
+    def rows(self):
+        """The recorded frames, oldest first, as lists of ns per scope"""
+        width = len(SCOPES)
+        count = min(self.recorded, self.frames)
+        first = self.recorded - count
+        return [self.ring[(frame % self.frames) * width:(frame % self.frames + 1) * width].tolist()
+                for frame in range(first, self.recorded)]
+    
+    def averages(self):
+        """Mean ms per scope over the buffer"""
+        rows = self.rows()
+        if not rows:
+            return [0.0] * len(SCOPES)
+        return [sum(column) / len(rows) / 1e6 for column in zip(*rows)]
+    
+    def plot(self, row):
+        """Scroll the cached graph left one pixel and paint this frame's column"""
+        graph = self.graph
+        if graph is None:
+            graph = self.graph = pygame.Surface((GRAPH_WIDTH, GRAPH_HEIGHT))
+            graph.fill(BACKGROUND)
+        graph.scroll(-1, 0)
+        x = GRAPH_WIDTH - 1
+        graph.fill(BACKGROUND, (x, 0, 1, GRAPH_HEIGHT))
+        scale = GRAPH_HEIGHT / (GRAPH_MS * 1e6)
+        bottom = GRAPH_HEIGHT
+        for scope, ns in enumerate(row):
+            height = ns * scale
+            if height <= 0:
+                continue
+            top = bottom - height
+            graph.fill(COLORS[scope], (x, int(top), 1, max(1, int(bottom) - int(top))))
+            bottom = top
+            if bottom <= 0:
+                break
+        budget = GRAPH_HEIGHT - int(BUDGET_MS / GRAPH_MS * GRAPH_HEIGHT)
+        graph.set_at((x, budget), (255, 255, 255))
+    
+    def draw(self, screen, x=10, y=None):
+        if not self.enabled or self.graph is None:
+            return
+        if y is None:
+            y = screen.get_height() - GRAPH_HEIGHT - 10
+        screen.blit(self.graph, (x, y))
+        if self.legend is None:
+            self.legend = self.render_legend()
+        if self.legend is not None:
+            screen.blit(self.legend, (x + GRAPH_WIDTH + 6, y))
+    
+    def render_legend(self):
+        if not pygame.font.get_init():
+            return None
+        font = pygame.font.Font(None, 16)
+        averages = self.averages()
+        line = font.get_linesize()
+        legend = pygame.Surface((130, line * (len(SCOPES) + 1)))
+        legend.fill(BACKGROUND)
+        for scope, (name, ms) in enumerate(zip(SCOPES, averages)):
+            legend.fill(COLORS[scope], (2, scope * line + 3, 8, 8))
+            legend.blit(font.render(f"{name} {ms:.2f}", True, (230, 230, 230)), (14, scope * line))
+        legend.blit(font.render(f"frame {sum(averages):.2f} ms", True, (255, 255, 255)),
+                    (2, len(SCOPES) * line))
+        return legend
+
+
+class Capture:
+    """F9: cProfile the next `frames` frames, then save <room>-<time>.pstats and .folded"""
+    def __init__(self, frames=300, folder='profiles'):
+        self.frames = frames
+        self.folder = folder
+        self.profile = None
+        self.left = 0
+        self.name = None
+    
+    def start(self, room):
+        """Start profiling (False if a capture is already running)"""
+        if self.profile is not None:
+            return False
+        self.name = f"{room}-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.left = self.frames
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        return True
+    
+    def end_frame(self):
+        """Count a frame. After the last one, save and return the two paths"""
+        if self.profile is None:
+            return None
+        self.left -= 1
+        if self.left > 0:
+            return None
+        profile, self.profile = self.profile, None
+        profile.disable()
+        return self.save(profile)
+    
+    def save(self, profile):
+        os.makedirs(self.folder, exist_ok=True)
+        base = os.path.join(self.folder, self.name)
+        profile.dump_stats(base + '.pstats')
+        stats = pstats.Stats(profile)
+        with open(base + '.folded', 'w') as f:
+            for stack, micros in sorted(collapse(stats.stats).items()):
+                f.write(f"{stack} {micros}\n")
+        return base + '.pstats', base + '.folded'
+
+
+def frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # Built-ins, e.g. <method 'blit' of 'pygame.surface.Surface' objects>
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapse(stats, min_micros=1, max_depth=80):
+    """pstats' {func: (cc, nc, tt, ct, callers)} -> {"root;...;leaf": microseconds}"""
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, edge_ct) in callers.items():
+            callees.setdefault(caller, []).append((func, edge_ct))
+    roots = [func for func, entry in stats.items()
+             if not any(caller in stats for caller in entry[4])]
+    folded = {}
+    
+    def walk(func, spent, path, seen):
+        _, _, tt, ct, _ = stats[func]
+        share = spent / ct if ct > 0 else 0
+        path = path + [frame_name(func)]
+        own = round(tt * share * 1e6)
+        if own >= min_micros:
+            key = ';'.join(path)
+            folded[key] = folded.get(key, 0) + own
+        if len(path) >= max_depth:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            if callee in seen:
+                continue  # Recursion: its time is already in this frame's
+            child = edge_ct * share
+            if child * 1e6 >= min_micros:
+                walk(callee, child, path, seen | {callee})
+    
+    for root in roots:
+        walk(root, stats[root][3], [], {root})
+    return folded
@@ -0,0 +1,112 @@
+"""
+Input recording and playback for Knight's Adventure.
+
+Each frame's input is a small bitmask. A recording is the world's seed plus
+those masks, run-length encoded (a mask byte and a varint run length), so an
+hour of play is a few kilobytes. With a deterministic World, playing the
+masks back reproduces the run exactly.
+"""
+
+import struct
+
+import pygame
+
+# Held keys
+IN_LEFT = 1
+IN_RIGHT = 2
+IN_X_HELD = 4  # Shopping works while X is held
+IN_REWIND = 128  # Z, in rewind rooms
+# Keys pressed this frame
+IN_UP = 8
+IN_X = 16
+IN_D = 32
+IN_R = 64
+
+PRESSES = {
+    pygame.K_UP: IN_UP,
+    pygame.K_x: IN_X,
+    pygame.K_d: IN_D,
+    pygame.K_r: IN_R,
+}
+
+MAGIC = b'KREC'
+VERSION = 1
+HEADER = struct.Struct('<4sBqBI')  # magic, version, seed, fixed point, frame count
+
+
+def read_input(events, keys):
+    """Input bits for one frame from its KEYDOWN events and the held-key state"""
+    bits = 0
+    for event in events:
+        if event.type == pygame.KEYDOWN:
+            bits |= PRESSES.get(event.key, 0)
+    if keys[pygame.K_LEFT]:
+        bits |= IN_LEFT
+    if keys[pygame.K_RIGHT]:
+        bits |= IN_RIGHT
+    if keys[pygame.K_x]:
+        bits |= IN_X_HELD
+    if keys[pygame.K_z]:
+        bits |= IN_REWIND
+    return bits
+
+
+class Recording:
+    """The seed a run started from and the input bits of every frame"""
+    def __init__(self, seed, fixed_point=False, frames=()):
+        self.seed = seed
+        self.fixed_point = fixed_point
+        self.frames = bytearray(frames)
+
+    def add(self, bits):
+        self.frames.append(bits)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def save(self, path):
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, self.fixed_point, len(self.frames)))
+        frames = self.frames
+        i = 0
+        while i < len(frames):
+            bits = frames[i]
+            run = 1
+            while i + run < len(frames) and frames[i + run] == bits:
+                run += 1
+            i += run
+            out.append(bits)
+            # Varint: 7 bits at a time, high bit means "more to come"
+            while run >= 0x80:
+                out.append((run & 0x7f) | 0x80)
+                run >>= 7
+            out.append(run)
+        with open(path, 'wb') as f:
+            f.write(out)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, seed, fixed_point, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} recording")
+        frames = bytearray()
+        pos = HEADER.size
+        while pos < len(data):
+            bits = data[pos]
+            pos += 1
+            run = shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                run |= (byte & 0x7f) << shift
+                shift += 7
+                if not byte & 0x80:
+                    break
+            frames.extend(bytes([bits]) * run)
+        if len(frames) != count:
+            raise ValueError(f"{path} is truncated ({len(frames)} of {count} frames)")
+        return cls(seed, bool(fixed_point), frames)
@@ -0,0 +1,116 @@
+"""
+Hold-to-rewind for Knight's Adventure.
+
+While the knight is in a rewind room the world pushes a snapshot every
+frame into a RewindBuffer, a ring of the last few seconds. Storing 300 full
+snapshots would be wasteful, and most bytes don't change from frame to
+frame, so only every Nth snapshot is kept whole (a keyframe). The rest only
+keep the runs of bytes that differ from the latest keyframe, found by
+halving: a slice that compares equal (a memcmp) is skipped whole, so a few
+changed fields cost a few dozen comparisons. That's much cheaper per frame
+than compressing (zlib sets up a few hundred KB of state on every call), and
+five seconds still comes to well under a megabyte.
+
+The world only pushes the room the knight is in (see World.step), so
+rewinding leaves the rest of the world running.
+
+Each delta holds a reference to its keyframe, so a keyframe lives exactly as
+long as something in the ring still needs it.
+"""
+
+import array
+
+RUN = 32  # Changed runs are found to this many bytes
+
+
+def changed_runs(snapshot, keyframe):
+    """(spans, data): start/end offsets of the runs where snapshot differs
+    from keyframe (same length), and snapshot's bytes in those runs, end to end"""
+    spans = array.array('I')
+    todo = [(0, len(snapshot))]
+    while todo:
+        start, end = todo.pop()
+        if snapshot[start:end] == keyframe[start:end]:
+            continue
+        if end - start > RUN:
+            middle = (start + end) // 2
+            todo.append((middle, end))
+            todo.append((start, middle))
+        elif spans and spans[-1] == start:
+            spans[-1] = end  # Carry on the run before it
+        else:
+            spans.append(start)
+            spans.append(end)
+    return spans, b''.join([snapshot[spans[i]:spans[i + 1]] for i in range(0, len(spans), 2)])
+
+
+def apply_runs(keyframe, spans, data):
+    """The snapshot changed_runs() came from"""
+    out = bytearray(keyframe)
+    pos = 0
+    for i in range(0, len(spans), 2):
+        start, end = spans[i], spans[i + 1]
+        out[start:end] = data[pos:pos + end - start]
+        pos += end - start
+    return bytes(out)
+
+
+class RewindBuffer:
+    """The last seconds * fps snapshots, newest last"""
+    def __init__(self, seconds=5, fps=60, keyframe_interval=30):
+        self.capacity = seconds * fps
+        self.keyframe_interval = keyframe_interval
+        self.entries = [None] * self.capacity
+        self.head = 0    # Where the next push goes
+        self.count = 0
+        self.keyframe = None
+        self.since_keyframe = 0
+
+    def push(self, snapshot):
+        keyframe = self.keyframe
+        if (keyframe is None or self.since_keyframe >= self.keyframe_interval
+                or len(snapshot) != len(keyframe)):
+            # Snapshot sizes drift when projectiles come and go; start a new keyframe then too
+            self.keyframe = keyframe = snapshot
+            self.since_keyframe = 0
+            entry = (keyframe, None)
+        else:
+            entry = (keyframe, changed_runs(snapshot, keyframe))
+        self.since_keyframe += 1
+        self.entries[self.head] = entry
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def pop(self):
+        """Remove and return the newest snapshot, or None if there's nothing left"""
+        if not self.count:
+            return None
+        self.head = (self.head - 1) % self.capacity
+        keyframe, delta = self.entries[self.head]
+        self.entries[self.head] = None
+        self.count -= 1
+        # Whatever gets pushed next starts fresh
+        self.keyframe = None
+        if delta is None:
+            return keyframe
+        return apply_runs(keyframe, *delta)
+
+    def clear(self):
+        self.entries = [None] * self.capacity
+        self.head = self.count = 0
+        self.keyframe = None
+
+    def __len__(self):
+        return self.count
+
+    def memory(self):
+        """Bytes held by keyframes and deltas"""
+        keyframes = {}
+        deltas = 0
+        for entry in self.entries:
+            if entry:
+                keyframes[id(entry[0])] = len(entry[0])
+                if entry[1]:
+                    spans, data = entry[1]
+                    deltas += spans.itemsize * len(spans) + len(data)
+        return sum(keyframes.values()) + deltas
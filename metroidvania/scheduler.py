@@ -0,0 +1,123 @@
+"""
+Frame-budget job scheduler for Knight's Adventure.
+
+A frame gets 1/60 s (16.6 ms). Simulating and drawing it come first, and
+then the main loop hands whatever time is left to a JobScheduler. Systems
+queue work that doesn't have to happen this very frame (re-planning an elite
+knight's route, building a room's nav graph, ticking a room nobody's in,
+writing the autosave) and the scheduler runs it when there's room:
+
+  - lower priority numbers go first, then oldest first
+  - a job only starts if its usual running time (a moving average per job
+    name) fits in what's left of the frame
+  - a job that has waited max_wait frames runs anyway (one a frame), so
+    nothing starves
+
+Adding a job with a key that's already waiting keeps the one that's there,
+so asking for the same work every frame doesn't pile it up.
+
+Anything that changes gameplay only goes through here in free play. A
+seeded world has to come out the same every run, so there those systems
+still do their work inline, on the frame it comes up (see World).
+"""
+
+import time
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+
+class Job:
+    __slots__ = ('name', 'func', 'args', 'priority', 'key', 'queued', 'order')
+
+    def __init__(self, name, func, args, priority, key, queued, order):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.key = key
+        self.queued = queued  # Frame it was added on
+        self.order = order
+
+
+class JobScheduler:
+    """Runs queued jobs in the time left over at the end of each frame"""
+    def __init__(self, budget=1 / 60, max_wait=60, clock=time.perf_counter):
+        self.budget = budget
+        self.max_wait = max_wait
+        self.clock = clock
+        self.frame = 0
+        self.jobs = []
+        self.keys = {}
+        self.costs = {}  # job name -> usual running time in seconds
+        self.added = 0
+        self.ran = 0
+        self.forced = 0  # Ran over budget because they'd waited max_wait frames
+
+    def add(self, name, func, *args, priority=NORMAL, key=None):
+        """Queue func(*args). name groups jobs for timing; key (if any) makes
+        sure only one job with that key waits at a time"""
+        if key is not None and key in self.keys:
+            return self.keys[key]
+        self.added += 1
+        job = Job(name, func, args, priority, key, self.frame, self.added)
+        self.jobs.append(job)
+        if key is not None:
+            self.keys[key] = job
+        return job
+
+    def pending(self, key):
+        return key in self.keys
+
+    def clear(self):
+        self.jobs.clear()
+        self.keys.clear()
+
+    def run(self, frame_start):
+        """Run jobs until the frame that started at frame_start (a clock()
+        reading) has used up its budget. Returns how many ran"""
+        self.frame += 1
+        deadline = frame_start + self.budget
+        count = 0
+        forced = False
+        while self.jobs:
+            job = None
+            if not forced:
+                job = self.overdue()
+                forced = job is not None
+                self.forced += forced
+            if job is None:
+                job = self.next_job(deadline - self.clock())
+            if job is None:
+                break
+            self.execute(job)
+            count += 1
+        return count
+
+    def run_all(self):
+        """Run everything that's queued, budget or not (headless runs, quitting)"""
+        while self.jobs:
+            self.execute(min(self.jobs, key=lambda job: (job.priority, job.order)))
+
+    def overdue(self):
+        """The oldest job that's waited max_wait frames, if any. At most one
+        of these runs per frame, so a backlog can't eat a whole frame"""
+        late = [job for job in self.jobs if self.frame - job.queued >= self.max_wait]
+        return min(late, key=lambda job: job.order) if late else None
+
+    def next_job(self, remaining):
+        """The most important job that should fit in remaining seconds, or None"""
+        fits = [job for job in self.jobs if self.costs.get(job.name, 0.0) <= remaining]
+        return min(fits, key=lambda job: (job.priority, job.order)) if fits else None
+
+    def execute(self, job):
+        self.jobs.remove(job)
+        if job.key is not None:
+            del self.keys[job.key]
+        start = self.clock()
+        job.func(*job.args)
+        took = self.clock() - start
+        usual = self.costs.get(job.name)
+        self.costs[job.name] = took if usual is None else usual * 0.8 + took * 0.2
+        self.ran += 1
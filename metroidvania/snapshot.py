@@ -0,0 +1,182 @@
+"""
+Binary snapshots of the whole world for Knight's Adventure.
+
+World.snapshot() packs everything that affects gameplay into one bytes
+object with struct, and World.restore(data) writes it back into the existing
+objects. Nothing gets pickled or rebuilt, which keeps both directions well
+under a millisecond - quick-save, rewind and rollback take thousands of them.
+
+Each class that has state lists it in a StateLayout. Rooms also remember
+which of their original entities are still around (killed enemies and
+collected items leave the room), and projectile pools save their live
+projectiles. Cosmetic state like slash particles and fireball trails is
+left out and simply cleared on restore.
+
+A snapshot can also hold just some of the rooms (rewind only keeps the room
+the knight is in). Restoring one of those leaves the other rooms, and the
+scheduler's clock, as they are.
+"""
+
+import array
+import operator
+import struct
+
+HEADER = struct.Struct('<4sBHiI??')  # magic, version, room, message timer, frame, dragon, game over
+MAGIC = b'KSNP'
+VERSION = 2
+COUNT = struct.Struct('<I')
+ROOM = struct.Struct('<HI')  # room index, last tick
+GAUSS = struct.Struct('<?d')
+
+
+class StateLayout:
+    """Which attributes of a class go into a snapshot, and how they're packed.
+
+    fields are (attribute, struct code) pairs, e.g. ('x', 'd'), ('health', 'i').
+    """
+    def __init__(self, *fields):
+        self.names = tuple(name for name, _ in fields)
+        self.struct = struct.Struct('<' + ''.join(code for _, code in fields))
+        self.get = operator.attrgetter(*self.names)
+
+    def pack(self, entity):
+        values = self.get(entity)
+        if len(self.names) == 1:
+            values = (values,)
+        return self.struct.pack(*values)
+
+    def unpack(self, data, pos, entity):
+        """Write the values at data[pos:] onto entity, return the new position"""
+        for name, value in zip(self.names, self.struct.unpack_from(data, pos)):
+            setattr(entity, name, value)
+        return pos + self.struct.size
+
+
+def _pack_rng(out, rng):
+    version, internal, gauss = rng.getstate()
+    out += array.array('I', internal).tobytes()
+    out += GAUSS.pack(gauss is not None, gauss or 0.0)
+
+
+def _unpack_rng(data, pos, rng):
+    size = 625 * 4
+    internal = array.array('I')
+    internal.frombytes(data[pos:pos + size])
+    pos += size
+    has_gauss, gauss = GAUSS.unpack_from(data, pos)
+    rng.setstate((3, tuple(internal), gauss if has_gauss else None))
+    return pos + GAUSS.size
+
+
+def _pack_string(out, text):
+    encoded = text.encode('utf-8')
+    out += COUNT.pack(len(encoded))
+    out += encoded
+
+
+def _unpack_string(data, pos):
+    (length,) = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    return bytes(data[pos:pos + length]).decode('utf-8'), pos + length
+
+
+def _pack_pool(out, pool):
+    layout = pool.kind.state
+    live = list(pool)
+    out += COUNT.pack(len(live))
+    for projectile in live:
+        out += layout.pack(projectile)
+
+
+def _unpack_pool(data, pos, pool):
+    # Projectile layouts start with x, y, direction: the arguments spawn() needs
+    layout = pool.kind.state
+    (count,) = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    pool.clear()
+    for _ in range(count):
+        x, y, direction = layout.struct.unpack_from(data, pos)[:3]
+        pos = layout.unpack(data, pos, pool.spawn(x, y, direction))
+    return pos
+
+
+def save_world(world, rooms=None):
+    """Pack the world, or with rooms (names) only those rooms along with the knights"""
+    names = list(world.rooms)
+    out = bytearray(HEADER.pack(MAGIC, VERSION, names.index(world.current_room),
+                                world.hud.timer, world.scheduler.frame,
+                                world.dragon_defeated, world.game_over))
+    _pack_string(out, world.hud.text)
+    _pack_rng(out, world.rng)
+    _pack_rng(out, world.fx_rng)
+    for player in world.players:
+        out += type(player).state.pack(player)
+    last_tick = world.scheduler.last_tick
+    saved = names if rooms is None else rooms
+    out += COUNT.pack(len(saved))
+    for name in saved:
+        room = world.rooms[name]
+        room.sync()
+        out += ROOM.pack(names.index(name), last_tick[name])
+        out += room.present
+        for entity, present in zip(room.roster, room.present):
+            if not present:
+                continue
+            layout = getattr(type(entity), 'state', None)
+            if layout:
+                out += layout.pack(entity)
+            for pool in getattr(entity, 'pools', ()):
+                _pack_pool(out, pool)
+    return bytes(out)
+
+
+def restore_world(world, data):
+    magic, version, room_index, message_timer, frame, dragon_defeated, game_over = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a version %d world snapshot" % VERSION)
+    pos = HEADER.size
+    names = list(world.rooms)
+    world.current_room = names[room_index]
+    world.dragon_defeated = dragon_defeated
+    world.game_over = game_over
+    message, pos = _unpack_string(data, pos)
+    world.hud.restore(message, message_timer)
+    pos = _unpack_rng(data, pos, world.rng)
+    pos = _unpack_rng(data, pos, world.fx_rng)
+    for player in world.players:
+        pos = type(player).state.unpack(data, pos, player)
+        player.slash_effects.clear()
+
+    scheduler = world.scheduler
+    scheduler.current = world.current_room
+    (count,) = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    if count == len(names):
+        scheduler.frame = frame
+    for _ in range(count):
+        index, last_tick = ROOM.unpack_from(data, pos)
+        pos += ROOM.size
+        name = names[index]
+        room = world.rooms[name]
+        # Partial snapshots don't turn the clock back, so their rooms count as up to date
+        scheduler.last_tick[name] = last_tick if count == len(names) else scheduler.frame
+        present = data[pos:pos + len(room.roster)]
+        pos += len(room.roster)
+        if present != room.present:
+            room.set_present(present)
+        for entity, here in zip(room.roster, present):
+            if not here:
+                continue
+            layout = getattr(type(entity), 'state', None)
+            if layout:
+                pos = layout.unpack(data, pos, entity)
+            for pool in getattr(entity, 'pools', ()):
+                pos = _unpack_pool(data, pos, pool)
+        if room.patrol is not None:
+            for patroller in room.patrollers:
+                room.patrol.write(patroller)
+        if room.flight is not None:
+            for flyer in room.flyers:
+                room.flight.write(flyer)
+    return pos
@@ -0,0 +1,75 @@
+"""CollisionWorld.pairs() against checking every pair"""
+
+import random
+
+import pygame
+import pytest
+
+from collision import CollisionWorld, Hitbox, PLAYER, PLAYER_ATTACK, ENEMY, ENEMY_PROJECTILE, PICKUP
+
+LAYERS = (PLAYER, PLAYER_ATTACK, ENEMY, ENEMY_PROJECTILE, PICKUP)
+HANDLED = ((PLAYER, ENEMY), (PLAYER_ATTACK, ENEMY), (ENEMY_PROJECTILE, PLAYER),
+           (PLAYER, PICKUP), (ENEMY, ENEMY))
+
+
+def brute_force(world):
+    """Every overlapping handled pair, as (earlier, later) in x order (ties keep insertion order)"""
+    handled = {frozenset(pair) for pair in world.handlers}
+    boxes = sorted(world.hitboxes, key=lambda box: box.rect.left)
+    found = []
+    for j, later in enumerate(boxes):
+        for earlier in boxes[:j]:
+            if (frozenset((earlier.layer, later.layer)) in handled
+                    and earlier.layer & later.mask and later.layer & earlier.mask
+                    and earlier.rect.colliderect(later.rect)):
+                found.append((earlier, later))
+    return found
+
+
+def random_world(rng, count):
+    world = CollisionWorld()
+    for layer_a, layer_b in HANDLED:
+        world.on(layer_a, layer_b, lambda a, b: None)
+    for _ in range(count):
+        # A coarse grid makes lots of rects that only share an edge
+        rect = pygame.Rect(rng.randrange(0, 200, 10), rng.randrange(0, 100, 10),
+                           rng.randrange(10, 60, 10), rng.randrange(10, 40, 10))
+        mask = 0
+        for layer in LAYERS:
+            if rng.random() < 0.7:
+                mask |= layer
+        world.add(Hitbox(object(), rect, rng.choice(LAYERS), mask))
+    return world
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_pairs_match_brute_force(seed):
+    rng = random.Random(seed)
+    world = random_world(rng, rng.randrange(0, 80))
+    assert world.pairs() == brute_force(world)
+
+
+def test_touching_edges_dont_collide():
+    world = CollisionWorld()
+    world.on(PLAYER, ENEMY, lambda a, b: None)
+    player = Hitbox('knight', pygame.Rect(0, 0, 10, 10), PLAYER, ENEMY)
+    world.add(player)
+    world.add(Hitbox('right', pygame.Rect(10, 0, 10, 10), ENEMY, PLAYER))
+    world.add(Hitbox('below', pygame.Rect(0, 10, 10, 10), ENEMY, PLAYER))
+    overlapping = Hitbox('overlap', pygame.Rect(9, 9, 10, 10), ENEMY, PLAYER)
+    world.add(overlapping)
+    assert world.pairs() == [(player, overlapping)]
+
+
+def test_masks_and_missing_handlers_filter_pairs():
+    hits = []
+    world = CollisionWorld()
+    world.on(PLAYER, ENEMY, lambda a, b: hits.append((a, b)))
+    rect = pygame.Rect(0, 0, 10, 10)
+    world.add(Hitbox('knight', rect, PLAYER, ENEMY | PICKUP))
+    world.add(Hitbox('ignores knights', rect.copy(), ENEMY, PICKUP))
+    world.add(Hitbox('no handler', rect.copy(), PICKUP, PLAYER))
+    world.add(Hitbox('enemy', rect.copy(), ENEMY, PLAYER))
+    world.add(Hitbox('other enemy', rect.copy(), ENEMY, ENEMY | PLAYER))
+    world.dispatch()
+    assert hits == [('knight', 'enemy'), ('knight', 'other enemy')]
@@ -0,0 +1,38 @@
+"""Two knights hitting or touching the same thing on the same frame"""
+
+import pygame
+
+import game
+
+
+def coop_world(**entities):
+    world = game.World(1, coop=True)
+    room = game.Room('start', [pygame.Rect(0, 550, 800, 50)], **entities)
+    world.rooms['start'] = room
+    world.current_room = 'start'
+    return world, room
+
+
+def test_both_knights_kill_one_enemy():
+    world, room = coop_world(rolling_enemies=[game.RollingEnemy(300, 520)])
+    enemy = room.entities[0]
+    killed = []
+    world.events.on(game.EnemyKilled, killed.append)
+    for player in world.players:
+        player.x, player.y = enemy.x, enemy.y - 10
+        player.attack()
+    world.step(0, 0)
+    assert not room.has(enemy)
+    assert len(killed) == 1
+
+
+def test_both_knights_pick_up_one_item():
+    world, room = coop_world(items=[game.Item(300, 500, 'map', game.GOLD)])
+    item = room.entities[0]
+    collected = []
+    world.events.on(game.ItemCollected, collected.append)
+    for player in world.players:
+        player.x, player.y = item.x, item.y
+    world.step(0, 0)
+    assert not room.has(item)
+    assert len(collected) == 1
@@ -0,0 +1,62 @@
+"""The vectorized patrol and flight engines against the per-entity updates"""
+
+import random
+
+import pytest
+
+import game
+from replay import IN_LEFT, IN_RIGHT, IN_UP, IN_X
+
+MOVES = (0, IN_LEFT, IN_RIGHT, IN_UP, IN_X, IN_X | IN_RIGHT)
+ROOMS = list(game.create_rooms())
+
+
+class EagerWorld(game.World):
+    """Publishes every room's engines after every step, as before lazy publishing"""
+    def enemy_system(self, room, frames=1):
+        game.World.enemy_system(self, room, frames)
+        room.sync()
+
+
+def play(world, room, frames, hash_every=None):
+    world.current_room = room
+    world.player.health = world.player.max_health = 99
+    rng = random.Random(room)
+    hashes = []
+    for frame in range(frames):
+        world.step(rng.choice(MOVES))
+        if hash_every and frame % hash_every == 0:
+            hashes.append(world.state_hash())
+    return hashes
+
+
+def proxies(room):
+    return [(entity.x, entity.y, entity.direction, entity.hit_flash, tuple(entity.rect))
+            for entity in room.patrollers + room.flyers]
+
+
+@pytest.mark.parametrize('room', ROOMS)
+def test_engines_match_scalar_updates(monkeypatch, room):
+    # Every room runs, on screen or caught up off screen, so each hash covers both engine paths
+    vectorized = game.World(3)
+    assert vectorized.rooms[room].patrol is not None
+    monkeypatch.setattr(game, 'np', None)
+    scalar = game.World(3)
+    assert scalar.rooms[room].patrol is None
+    assert play(vectorized, room, 240, hash_every=40) == play(scalar, room, 240, hash_every=40)
+
+
+def test_lazy_publish_matches_eager():
+    # Off-screen rooms step with publish=False; walking into one has to bring every proxy up to date.
+    # No state_hash() until the end: it syncs every room.
+    lazy, eager = game.World(3), EagerWorld(3)
+    for name in ROOMS:
+        play(lazy, name, 60)
+        play(eager, name, 60)
+        assert any(engine.stale for room in lazy.rooms.values() for engine in (room.patrol, room.flight))
+        assert proxies(lazy.rooms[name]) == proxies(eager.rooms[name])
+    for name, room in lazy.rooms.items():
+        room.sync()
+        assert not (room.patrol.stale or room.flight.stale)
+        assert proxies(room) == proxies(eager.rooms[name])
+    assert lazy.state_hash() == eager.state_hash()
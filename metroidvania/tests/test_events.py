@@ -0,0 +1,27 @@
+"""Achievements and telemetry"""
+
+import game
+from events import EnemyKilled, RoomEntered
+
+
+def test_explorer_and_collector_can_unlock():
+    world = game.World(1)
+    achievements = world.achievements
+    assert 'dash_room' not in achievements.rooms
+    assert 'dash' not in achievements.power_ups
+    for room in achievements.rooms:
+        world.events.emit(RoomEntered(room, 'start'))
+    for item_type in achievements.power_ups:
+        world.events.emit(game.ItemCollected(item_type))
+    assert 'explorer' in achievements.unlocked
+    assert 'collector' in achievements.unlocked
+
+
+def test_telemetry_counts_by_event_class():
+    world = game.World(1)
+    world.events.emit(RoomEntered('knights', 'item'))
+    world.events.emit(EnemyKilled("Black Knight"))
+    summary = world.telemetry.summary()
+    assert summary['events']['EnemyKilled'] == 1
+    assert summary['rooms']['knights'] == {'RoomEntered': 1, 'EnemyKilled': 1}
+    assert summary['kills'] == {"Black Knight": 1}
@@ -0,0 +1,33 @@
+"""MemoryMonitor's per-room accounting"""
+
+import tracemalloc
+
+import pygame
+
+import game
+from memory import MemoryMonitor
+
+
+def same_room(name):
+    return game.Room(name, [pygame.Rect(0, 550, 800, 50), pygame.Rect(200, 400, 150, 20)],
+                     enemies=[game.Enemy(100, 515, 80), game.Enemy(400, 515, 60)],
+                     flying_enemies=[game.FlyingEnemy(100 + 150 * i, 200, pattern)
+                                     for i, pattern in enumerate(game.PATTERNS)],
+                     items=[game.Item(300, 500, 'map', game.GOLD)])
+
+
+def test_same_shaped_rooms_report_similar_sizes():
+    # Shared module data (flight patterns, tables) must not land on whichever room is walked first
+    world = game.World(1)
+    world.rooms = {'first': same_room('first'), 'second': same_room('second')}
+    world.current_room = 'first'
+    tracing = tracemalloc.is_tracing()
+    try:
+        sample = MemoryMonitor(world).samples[0]
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    first, second = sample['rooms']['first'], sample['rooms']['second']
+    assert abs(first['bytes'] - second['bytes']) <= 0.02 * second['bytes']
+    # Only the constants in this file's code are shared, and charged to the first
+    assert abs(first['objects'] - second['objects']) <= 0.05 * second['objects']
@@ -0,0 +1,90 @@
+"""NavGraph building, A* and the disk cache"""
+
+import os
+
+import pygame
+import pytest
+
+import game
+import nav
+from nav import DROP, JUMP, WALK, NavGraph, graph_for, layout_key
+
+PHYSICS = dict(width=20, jump_power=12, gravity=0.6, speed=5)
+
+
+def layout():
+    return [
+        pygame.Rect(0, 550, 400, 50),     # 0 floor
+        pygame.Rect(400, 550, 400, 50),   # 1 more floor, level with it
+        pygame.Rect(150, 460, 100, 20),   # 2 ledge a jump up
+        pygame.Rect(300, 380, 100, 20),   # 3 a jump up from the ledge
+        pygame.Rect(600, 100, 100, 20),   # 4 out of reach
+    ]
+
+
+@pytest.fixture
+def no_memory_cache(monkeypatch):
+    monkeypatch.setattr(nav, '_graphs', {})
+
+
+def test_key_changes_with_layout_and_physics():
+    key = layout_key(layout(), **PHYSICS)
+    assert layout_key(layout(), **PHYSICS) == key
+    moved = layout()
+    moved[2].y += 1
+    assert layout_key(moved, **PHYSICS) != key
+    assert layout_key(layout()[:-1], **PHYSICS) != key
+    for name, value in (('jump_power', 13), ('gravity', 0.5), ('width', 21), ('speed', 4)):
+        assert layout_key(layout(), **dict(PHYSICS, **{name: value})) != key
+
+
+def test_paths_are_chains_of_edges():
+    graph = NavGraph(layout(), **PHYSICS)
+    assert graph.find_path(0, 0) == []
+    for start, goal in ((0, 3), (3, 0), (0, 1), (1, 2), (3, 1)):
+        path = graph.find_path(start, goal)
+        assert path, (start, goal)
+        assert path[0].source == start and path[-1].target == goal
+        for edge, following in zip(path, path[1:]):
+            assert edge.target == following.source
+        for edge in path:
+            assert edge.kind in (WALK, DROP, JUMP)
+            assert edge in graph.edges[edge.source]
+    assert [edge.kind for edge in graph.find_path(0, 1)] == [WALK]
+    assert graph.find_path(0, 4) is None
+    assert graph.edges[4] and all(edge.kind == DROP for edge in graph.edges[4])
+
+
+def test_disk_cache_round_trip_and_invalidation(tmp_path, no_memory_cache):
+    built = graph_for(layout(), cache_dir=str(tmp_path), **PHYSICS)
+    path = tmp_path / (layout_key(layout(), **PHYSICS) + '.json')
+    assert path.exists()
+
+    nav._graphs.clear()
+    loaded = graph_for(layout(), cache_dir=str(tmp_path), **PHYSICS)
+    assert loaded is not built
+    rows = lambda graph: sorted((e.kind, e.source, e.target, e.takeoff, e.landing, e.cost)
+                                for edges in graph.edges.values() for e in edges)
+    assert rows(loaded) == rows(built)
+
+    # Different physics is a different file, built fresh
+    higher = graph_for(layout(), cache_dir=str(tmp_path), **dict(PHYSICS, jump_power=20))
+    assert len(os.listdir(tmp_path)) == 2
+    assert rows(higher) != rows(built)
+
+    # A file from another version is rebuilt and replaced
+    path.write_text('{"version": 0, "edges": []}')
+    nav._graphs.clear()
+    assert rows(graph_for(layout(), cache_dir=str(tmp_path), **PHYSICS)) == rows(built)
+    assert '"version": %d' % nav.VERSION in path.read_text()
+
+
+@pytest.mark.parametrize('room', ['elite1', 'elite2'])
+def test_elites_can_jump_off_the_floor(room):
+    # The nav graph only matters if an elite standing on the floor has somewhere to go
+    platforms = game.create_rooms()[room].platform_index
+    elite = game.EliteKnight(300, 500, 100)
+    graph = NavGraph(platforms.platforms, width=elite.width, jump_power=elite.jump_power,
+                     gravity=elite.gravity, speed=elite.speed)
+    floor = max(range(len(platforms.platforms)), key=lambda i: platforms.platforms[i].width)
+    assert {edge.kind for edge in graph.edges[floor]} == {JUMP}
@@ -0,0 +1,95 @@
+"""ProjectilePool's alive mask and swap-remove"""
+
+import pygame
+
+from collision import CollisionWorld, Hitbox, ENEMY_PROJECTILE, PLAYER
+from pools import ProjectilePool
+
+
+class Dart:
+    """A projectile that lives for `x` frames and counts its updates"""
+    def __init__(self, x, y, direction):
+        self.rect = pygame.Rect(0, 0, 10, 10)
+        self.hitbox = Hitbox(self, self.rect, ENEMY_PROJECTILE, PLAYER)
+        self.pool, self.pool_slot = None, -1
+        self.reset(x, y, direction)
+
+    def reset(self, x, y, direction):
+        self.lifetime = x
+        self.tag = y
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+        self.lifetime -= 1
+
+    def is_alive(self):
+        return self.lifetime > 0
+
+
+def check_packed(pool):
+    assert all(pool.alive[:pool.count])
+    assert not any(pool.alive[pool.count:])
+    assert [dart.pool_slot for dart in pool.items] == list(range(len(pool.items)))
+
+
+def test_removing_from_the_middle_keeps_the_mask_consistent():
+    pool = ProjectilePool(Dart, capacity=4)
+    darts = [pool.spawn(100, tag, 1) for tag in range(7)]  # Grows past capacity
+    pool.kill(darts[1])
+    pool.kill(darts[3])
+    pool.kill(darts[4])
+    assert [dart.tag for dart in pool] == [0, 2, 5, 6]
+    assert len(pool) == 4
+    pool.compact()
+    check_packed(pool)
+    assert pool.count == 4
+    assert sorted(dart.tag for dart in pool) == [0, 2, 5, 6]
+    # The dead ones come back first
+    assert pool.spawn(100, 7, 1) in (darts[1], darts[3], darts[4])
+    check_packed(pool)
+
+
+def test_update_runs_each_live_projectile_once():
+    pool = ProjectilePool(Dart)
+    darts = [pool.spawn(lifetime, tag, 1) for tag, lifetime in enumerate((3, 1, 5, 1, 2, 1))]
+    pool.update()
+    assert [dart.updates for dart in darts] == [1] * 6
+    check_packed(pool)
+    assert sorted(dart.tag for dart in pool) == [0, 2, 4]
+    pool.update()
+    assert [dart.updates for dart in darts] == [2, 1, 2, 1, 2, 1]
+    assert sorted(dart.tag for dart in pool) == [0, 2]
+
+
+def test_killing_during_dispatch_doesnt_skip_or_double_hit():
+    pool = ProjectilePool(Dart)
+    darts = [pool.spawn(100, tag, 1) for tag in range(6)]
+    hits = []
+
+    def dart_hits_knight(knight, dart):
+        hits.append(dart.tag)
+        dart.pool.kill(dart)
+        if dart.tag == 1:
+            pool.kill(darts[4])  # Killing one that's still to come doesn't move anything
+
+    collisions = CollisionWorld()
+    collisions.on(PLAYER, ENEMY_PROJECTILE, dart_hits_knight)
+    collisions.add(Hitbox('knight', pygame.Rect(0, 0, 10, 10), PLAYER, ENEMY_PROJECTILE))
+    for dart in pool:
+        collisions.add(dart.hitbox)
+    collisions.dispatch()
+    assert sorted(hits) == [0, 1, 2, 3, 4, 5]
+    assert len(pool) == 0
+
+    # Same through iteration: a kill mid-loop neither skips the next one nor repeats one
+    darts = [pool.spawn(100, tag, 1) for tag in range(6)]
+    pool.compact()
+    seen = []
+    for dart in pool:
+        seen.append(dart.tag)
+        pool.kill(dart)
+    assert sorted(seen) == list(range(6))
+    pool.update()
+    check_packed(pool)
+    assert pool.count == 0
@@ -0,0 +1,30 @@
+"""Recording save/load (the run-length, varint encoding)"""
+
+import random
+
+import pytest
+
+from replay import Recording
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_masks_round_trip(tmp_path, seed):
+    rng = random.Random(seed)
+    frames = bytearray()
+    while len(frames) < 5000:
+        # Short runs, runs around the 127/128 varint boundary and long ones
+        run = rng.choice((1, 2, rng.randrange(1, 300), 127, 128, 16384, rng.randrange(1, 40000)))
+        frames.extend(bytes([rng.randrange(256)]) * run)
+    recording = Recording(seed, fixed_point=bool(seed % 2), frames=frames)
+    path = tmp_path / 'run.krec'
+    recording.save(path)
+    loaded = Recording.load(path)
+    assert loaded.seed == seed
+    assert loaded.fixed_point == recording.fixed_point
+    assert loaded.frames == frames
+
+
+def test_empty_recording(tmp_path):
+    path = tmp_path / 'empty.krec'
+    Recording(3).save(path)
+    assert len(Recording.load(path)) == 0
@@ -0,0 +1,63 @@
+"""RewindBuffer and hold-to-rewind"""
+
+import random
+
+import game
+from replay import IN_LEFT, IN_REWIND, IN_RIGHT, IN_UP, IN_X
+from rewind import RewindBuffer, apply_runs, changed_runs
+
+MOVES = (0, IN_LEFT, IN_RIGHT, IN_UP, IN_X, IN_X | IN_RIGHT)
+
+
+def dragon_world():
+    world = game.World(5)
+    world.current_room = 'dragon'
+    world.player.health = world.player.max_health = 99
+    return world
+
+
+def test_changed_runs_round_trip():
+    rng = random.Random(2)
+    for size in (0, 1, 31, 32, 33, 500, 5000):
+        keyframe = bytes(rng.randrange(256) for _ in range(size))
+        snapshot = bytearray(keyframe)
+        for _ in range(rng.randrange(0, 20)):
+            if size:
+                snapshot[rng.randrange(size)] ^= rng.randrange(1, 256)
+        spans, data = changed_runs(bytes(snapshot), keyframe)
+        assert apply_runs(keyframe, spans, data) == snapshot
+
+
+def test_pop_restores_each_pushed_state_past_an_evicted_keyframe():
+    world = dragon_world()
+    # 80 pushes into 50 slots: the keyframes from pushes 0-24 are gone from the
+    # ring, and the oldest entries left are deltas against the one from push 24
+    buffer = RewindBuffer(seconds=1, fps=50, keyframe_interval=8)
+    rng = random.Random(1)
+    hashes = []
+    for _ in range(80):
+        world.step(rng.choice(MOVES))
+        buffer.push(world.snapshot())
+        hashes.append(world.state_hash())
+    assert len(buffer) == 50
+    # The oldest entry is a delta whose keyframe has been pushed out of the ring
+    keyframe, delta = buffer.entries[buffer.head]
+    assert delta is not None
+    assert not any(entry == (keyframe, None) for entry in buffer.entries)
+    for expected in reversed(hashes[-50:]):
+        world.restore(buffer.pop())
+        assert world.state_hash() == expected
+    assert buffer.pop() is None
+
+
+def test_holding_rewind_goes_back_frame_by_frame():
+    world = dragon_world()
+    rng = random.Random(3)
+    hashes = []
+    for _ in range(120):
+        hashes.append(world.state_hash(('dragon',)))
+        world.step(rng.choice(MOVES))
+    # Each rewound frame is the state that frame started from, in this room
+    for expected in reversed(hashes):
+        world.step(IN_REWIND)
+        assert world.state_hash(('dragon',)) == expected
@@ -0,0 +1,46 @@
+"""save_world/restore_world round trips"""
+
+import random
+
+import pytest
+
+import game
+from replay import IN_LEFT, IN_RIGHT, IN_UP, IN_X
+from snapshot import restore_world, save_world
+
+MOVES = (0, IN_LEFT, IN_RIGHT, IN_UP, IN_X, IN_X | IN_RIGHT)
+
+
+def played(coop, frames=240):
+    world = game.World(7, coop=coop)
+    for player in world.players:
+        player.health = player.max_health = 99
+    rng = random.Random(coop)
+    for _ in range(frames):
+        world.step(*(rng.choice(MOVES) for _ in world.players))
+    return world
+
+
+@pytest.mark.parametrize('coop', [False, True])
+def test_restore_into_fresh_world(coop):
+    world = played(coop)
+    data = save_world(world)
+    copy = game.World(7, coop=coop)
+    restore_world(copy, data)
+    assert copy.state_hash() == world.state_hash()
+    assert save_world(copy) == data
+
+
+@pytest.mark.parametrize('coop', [False, True])
+def test_restore_then_replay(coop):
+    world = played(coop)
+    data = save_world(world)
+    rng = random.Random(1)
+    inputs = [tuple(rng.choice(MOVES) for _ in world.players) for _ in range(120)]
+    for bits in inputs:
+        world.step(*bits)
+    expected = world.state_hash()
+    restore_world(world, data)
+    for bits in inputs:
+        world.step(*bits)
+    assert world.state_hash() == expected